@@ -7,6 +7,7 @@
 const multer = require('multer');
 const path = require('path');
 const fs = require('fs');
+const net = require('net');
 const FormData = require('form-data');
 const axios = require('axios');
 const Report = require('../models/Report');
@@ -15,6 +16,9 @@ const Alert = require('../models/alert');
 
 // AI Service URL from environment (defaults to localhost:5001)
 const AI_SERVICE_URL = process.env.AI_SERVICE_URL || 'http://localhost:5001';
+// Unix socket of a co-located AI service (UDS_PATH on the Model side). When
+// set, uploads use the binary transport instead of HTTP multipart.
+const AI_SERVICE_SOCKET = process.env.AI_SERVICE_SOCKET;
 
 const storage = multer.diskStorage({
   destination: (req, file, cb) => cb(null, 'uploads/'),
@@ -76,6 +80,61 @@ function fallbackClassify() {
   };
 }
 
+/**
+ * Binary transport to a co-located AI service (see Model/uds_transport.py).
+ * Request: 16-byte header (magic, version, quality, flags, threshold, length) + image bytes.
+ * Response: 12-byte header (magic, version, status, length) + compact JSON.
+ *
+ * @param {Buffer} imageBytes - Encoded image file contents
+ * @returns {Promise<{status: number, data: object}>}
+ */
+function classifyOverSocket(imageBytes, threshold = 0.4) {
+  return new Promise((resolve, reject) => {
+    const header = Buffer.alloc(16);
+    header.write('WALE', 0, 'ascii');
+    header.writeUInt8(1, 4);           // protocol version
+    header.writeUInt8(0, 5);           // quality: auto
+    header.writeUInt16BE(0, 6);        // flags: no detection list
+    header.writeFloatBE(threshold, 8);
+    header.writeUInt32BE(imageBytes.length, 12);
+
+    let response = Buffer.alloc(0);
+    let settled = false;
+    const sock = net.createConnection(AI_SERVICE_SOCKET, () => {
+      sock.write(header);
+      sock.write(imageBytes);
+    });
+    sock.setTimeout(30000, () => sock.destroy(new Error('AI socket timed out')));
+    sock.on('data', (chunk) => {
+      response = Buffer.concat([response, chunk]);
+      if (response.length < 12 || settled) return;
+      // Do not trust the length field of something that is not a v1 response
+      if (response.toString('ascii', 0, 4) !== 'WALE' || response.readUInt8(4) !== 1) {
+        settled = true;
+        sock.destroy();
+        reject(new Error('AI socket sent an invalid response header'));
+        return;
+      }
+      const length = response.readUInt32BE(8);
+      if (response.length < 12 + length) return;
+      settled = true;
+      sock.end();
+      try {
+        resolve({
+          status: response.readUInt16BE(6),
+          data: JSON.parse(response.subarray(12, 12 + length).toString('utf8')),
+        });
+      } catch (err) {
+        reject(err);
+      }
+    });
+    sock.on('error', (err) => { settled = true; reject(err); });
+    sock.on('close', () => {
+      if (!settled) reject(new Error('AI socket closed before a full response'));
+    });
+  });
+}
+
 /**
  * AI Classification: streams image bytes directly to the Flask AI service.
  * Uses form-data so no shared filesystem is required between Render and HF Spaces.
@@ -85,6 +144,27 @@ function fallbackClassify() {
  * @returns {Promise<{wasteType, confidence, confidencePercent, categoryDetail, categoryInfo, aiPowered}>}
  */
 async function aiClassify(tempFilePath, originalName) {
+  if (AI_SERVICE_SOCKET) {
+    try {
+      const { status, data } = await classifyOverSocket(await fs.promises.readFile(tempFilePath));
+      if (status !== 200) {
+        console.warn('AI service returned failure:', data.message);
+        return fallbackClassify();
+      }
+      return {
+        wasteType: data.wasteType,
+        confidence: data.confidence,
+        confidencePercent: data.confidencePercent,
+        categoryDetail: data.categoryDetail,
+        categoryInfo: FALLBACK_CATEGORY_INFO[data.wasteType] || {},  // not sent over the socket
+        aiPowered: true
+      };
+    } catch (err) {
+      console.warn('AI socket unavailable, using fallback classifier:', err.message);
+      return fallbackClassify();
+    }
+  }
+
   const form = new FormData();
   // Stream the temp file directly — never loads the whole file into memory
   form.append('image', fs.createReadStream(tempFilePath), {
@@ -0,0 +1,224 @@
+"""
+WALL.E Video / Frame-Sequence Classification
+=============================================
+Builds a waste-category timeline for street-camera or dashcam footage without
+running Faster RCNN on every frame.
+
+The pipeline:
+  1. Read frames from a video file (needs PyAV: pip install av) or from a
+     directory of frame images (sorted by name, timed with --fps)
+  2. Optionally decimate to --sample-fps
+  3. Compare a 32x32 grayscale thumbnail of each frame with the last key
+     frame; frames that changed by more than --change-threshold (or that are
+     --max-gap frames past the last key) become key frames
+  4. Run batched detection on key frames only; every other frame carries
+     the detections of the key frame before it
+  5. Merge consecutive frames with the same dominant category into segments
+
+Run:
+    python classify_video.py dashcam.mp4              # → dashcam.mp4.timeline.json
+    python classify_video.py frames/ --fps 10 --sample-fps 5 --quality fast
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+
+import numpy as np
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+
+# ─── FRAME SOURCES ──────────────────────────────────────────────────────────────
+
+def iter_frame_dir(folder, fps):
+    """Yield (timestamp_s, PIL image) for image files in a directory."""
+    import waste_classifier_api as api
+    names = sorted(n for n in os.listdir(folder) if n.lower().endswith(IMAGE_EXTENSIONS))
+    for i, name in enumerate(names):
+        # Same header probe and JPEG draft decode as /classify
+        yield i / fps, api.decode_image(os.path.join(folder, name))
+
+
+def iter_video(path):
+    """Yield (timestamp_s, PIL image) for each decoded video frame."""
+    try:
+        import av
+    except ImportError:
+        raise SystemExit("ERROR: reading video files requires PyAV (pip install av). "
+                         "Alternatively pass a directory of extracted frames.")
+
+    with av.open(path) as container:
+        stream = container.streams.video[0]
+        stream.thread_type = "AUTO"   # multi-threaded decode
+        rate = float(stream.average_rate or 25)
+        for i, frame in enumerate(container.decode(stream)):
+            t = float(frame.pts * stream.time_base) if frame.pts is not None else i / rate
+            yield t, frame.to_image()
+
+
+def sample(frames, sample_fps):
+    """Keep at most `sample_fps` frames per second of footage."""
+    if not sample_fps:
+        yield from frames
+        return
+    step = 1.0 / sample_fps
+    next_t = None
+    for t, img in frames:
+        if next_t is None or t >= next_t - 1e-6:
+            next_t = t + step
+            yield t, img
+
+
+# ─── KEY-FRAME SELECTION ────────────────────────────────────────────────────────
+
+def signature(img):
+    """Tiny grayscale thumbnail used to measure frame-to-frame change."""
+    return np.asarray(img.convert("L").resize((32, 32)), dtype=np.float32) / 255.0
+
+
+class KeyFrameSelector:
+    def __init__(self, change_threshold, max_gap):
+        self.change_threshold = change_threshold
+        self.max_gap          = max_gap
+        self._last_sig        = None
+        self._since_key       = 0
+
+    def is_key(self, img):
+        sig = signature(img)
+        if (self._last_sig is None or self._since_key >= self.max_gap
+                or float(np.abs(sig - self._last_sig).mean()) > self.change_threshold):
+            self._last_sig  = sig
+            self._since_key = 0
+            return True
+        self._since_key += 1
+        return False
+
+
+# ─── TIMELINE ───────────────────────────────────────────────────────────────────
+
+def build_segments(frames, min_segment_s):
+    """Merge per-frame verdicts into [start, end) segments of one category."""
+    segments = []
+    for i, f in enumerate(frames):
+        end = frames[i + 1]["t"] if i + 1 < len(frames) else f["t"]
+        if segments and segments[-1]["wasteType"] == f["wasteType"]:
+            seg = segments[-1]
+            seg["end"] = end
+            seg["frames"] += 1
+            seg["keyFrames"] += int(f["key"])
+            seg["_conf"] += f["confidence"]
+        else:
+            segments.append({
+                "start": f["t"], "end": end, "wasteType": f["wasteType"],
+                "frames": 1, "keyFrames": int(f["key"]), "_conf": f["confidence"],
+            })
+
+    # Fold flickers shorter than min_segment_s into the preceding segment.
+    merged = []
+    for seg in segments:
+        if merged and (seg["end"] - seg["start"] < min_segment_s
+                       or merged[-1]["wasteType"] == seg["wasteType"]):
+            prev = merged[-1]
+            prev["end"] = seg["end"]
+            prev["frames"] += seg["frames"]
+            prev["keyFrames"] += seg["keyFrames"]
+            prev["_conf"] += seg["_conf"]
+        else:
+            merged.append(seg)
+
+    for seg in merged:
+        seg["confidence"] = round(seg.pop("_conf") / seg["frames"], 4)
+        seg["start"] = round(seg["start"], 3)
+        seg["end"] = round(seg["end"], 3)
+    return merged
+
+
+def classify_frames(api, frames, args):
+    """Run key-frame detection over a frame stream; returns per-frame verdicts."""
+    selector = KeyFrameSelector(args.change_threshold, args.max_gap)
+    results  = []
+    pending  = []     # (timestamp, is_key, image or None) awaiting the next batch
+    last     = None   # verdict of the most recent key frame
+
+    def flush():
+        nonlocal last
+        keys = [img for _, is_key, img in pending if is_key]
+        detections = api.run_faster_rcnn_batch(keys, args.threshold, quality=args.quality) if keys else []
+        it = iter(detections)
+        for t, is_key, _ in pending:
+            if is_key:
+                dets = next(it)
+                # Same verdict as classify_image, including "Mixed" for no detections
+                summary = api.aggregate_waste_category(dets)
+                last = {
+                    "wasteType":  summary["wasteType"],
+                    "confidence": summary["confidence"],
+                    "detections": len(dets),
+                }
+            results.append({"t": t, "key": is_key, **last})
+        pending.clear()
+
+    for t, img in frames:
+        is_key = selector.is_key(img)
+        pending.append((t, is_key, img if is_key else None))
+        if is_key and sum(1 for p in pending if p[1]) >= args.batch_size:
+            flush()
+    if pending:
+        flush()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Waste-category timeline for video or frame sequences")
+    parser.add_argument("input", help="Video file or directory of frame images")
+    parser.add_argument("--output", default=None, help="Timeline JSON path (default: <input>.timeline.json)")
+    parser.add_argument("--fps", type=float, default=25.0, help="Frame rate of a frame directory")
+    parser.add_argument("--sample-fps", type=float, default=0, help="Decimate to this many frames/s (0 = all)")
+    parser.add_argument("--change-threshold", type=float, default=0.06,
+                        help="Mean thumbnail difference (0-1) that starts a new key frame")
+    parser.add_argument("--max-gap", type=int, default=50, help="Force a key frame after this many frames")
+    parser.add_argument("--batch-size", type=int, default=4, help="Key frames per forward pass")
+    parser.add_argument("--threshold", type=float, default=0.4, help="Detection confidence cutoff")
+    parser.add_argument("--quality", choices=["full", "balanced", "fast"], default="full")
+    parser.add_argument("--min-segment", type=float, default=1.0,
+                        help="Segments shorter than this (seconds) merge into the previous one")
+    parser.add_argument("--frames", action="store_true", help="Include per-frame verdicts in the output")
+    args = parser.parse_args()
+
+    os.environ.setdefault("INFERENCE_MAX_CONCURRENCY", "1")
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import waste_classifier_api as api
+
+    source = iter_frame_dir(args.input, args.fps) if os.path.isdir(args.input) else iter_video(args.input)
+
+    t0 = time.perf_counter()
+    frames = classify_frames(api, sample(source, args.sample_fps), args)
+    elapsed = time.perf_counter() - t0
+
+    duration = frames[-1]["t"] if frames else 0.0
+    keys = sum(1 for f in frames if f["key"])
+    timeline = {
+        "source":       args.input,
+        "modelSource":  api.model_source,
+        "frames":       len(frames),
+        "keyFrames":    keys,
+        "durationS":    round(duration, 3),
+        "processingS":  round(elapsed, 3),
+        "realtimeFactor": round(duration / elapsed, 2) if elapsed > 0 else None,
+        "segments":     build_segments(frames, args.min_segment),
+    }
+    if args.frames:
+        timeline["frameVerdicts"] = frames
+
+    output = args.output or args.input.rstrip("/\\") + ".timeline.json"
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(timeline, f, indent=2)
+    print(f"  [OK] {len(frames)} frames ({keys} key) in {elapsed:.1f}s "
+          f"({timeline['realtimeFactor']}x real time) -> {len(timeline['segments'])} segments in {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+"""
+Incremental dataset manifest
+============================
+Records every training image once (path, label, file size, mtime, width,
+height) so CustomWetWasteDataset does not have to list and glob every class
+folder on each run, and so dataset statistics never need to reopen images.
+
+Updates are incremental: a class folder is only rescanned when its directory
+mtime changed (files added, removed or renamed), and within a rescanned
+folder only files whose size or mtime changed are probed again (header-only
+read via PIL, no decode).  Files edited in place do not change the folder
+mtime; pass full=True / --full to re-check every file.
+
+Stored as JSON under ~/.cache/walle/manifests/ by default (override with
+WALLE_MANIFEST_DIR), outside the dataset: writing into the scanned folder
+would bump its mtime and force a rescan, and fails on read-only mounts.  If
+the manifest cannot be written, the listing is still returned in memory.
+
+Run:
+    python dataset_manifest.py /data/waste            # create / update
+    python dataset_manifest.py /data/waste --stats    # plus size/aspect statistics
+"""
+
+import os
+import sys
+import json
+import hashlib
+import argparse
+
+MANIFEST_VERSION = 1
+MANIFEST_DIR = os.environ.get(
+    "WALLE_MANIFEST_DIR",
+    os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "walle", "manifests"),
+)
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+# Mapping definition based on sorted: ['Dry', 'E-Waste', 'Mixed', 'Wet']
+# 1-indexed: Dry=1, E-Waste=2, Mixed=3, Wet=4
+LABEL_MAPPING = {
+    'dry': 1,
+    'e-waste': 2,
+    'mixed': 3,
+    'wet': 4
+}
+FALLBACK_LABEL = 4  # single-folder mode: everything is Wet waste
+
+
+def label_for_folder(name):
+    """Class ID for a subfolder name, or None if it is not a class folder."""
+    name_lower = name.lower()
+    for key, val in LABEL_MAPPING.items():
+        if key in name_lower:
+            return val
+    return None
+
+
+def default_manifest_path(folder):
+    """Per-dataset manifest file in MANIFEST_DIR, keyed by the absolute folder path."""
+    folder = os.path.abspath(folder)
+    digest = hashlib.sha1(folder.encode("utf-8")).hexdigest()[:12]
+    name = os.path.basename(folder.rstrip(os.sep)) or "root"
+    return os.path.join(MANIFEST_DIR, f"{name}-{digest}.json")
+
+
+def load_manifest(path):
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return manifest if manifest.get("version") == MANIFEST_VERSION else None
+
+
+def save_manifest(manifest, path):
+    # Write-and-rename so a concurrent reader never sees a torn file
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        os.replace(tmp, path)
+    except OSError:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def _write_manifest(manifest, manifest_path, fallback_path, verbose):
+    """Save to manifest_path, else fallback_path; return the path written or None."""
+    for path in dict.fromkeys((manifest_path, fallback_path)):
+        try:
+            save_manifest(manifest, path)
+            return path
+        except OSError as e:
+            if verbose:
+                print(f"Manifest: cannot write {path} ({e})")
+    return None
+
+
+def _probe(path):
+    """(width, height) from the image header, or None if unreadable."""
+    from PIL import Image
+    try:
+        with Image.open(path) as img:
+            return img.size
+    except Exception:
+        return None
+
+
+def _scan_dir(dir_path, previous):
+    """Return ({name: entry}, skipped) for one folder, reusing unchanged entries."""
+    files, skipped = {}, 0
+    with os.scandir(dir_path) as it:
+        for entry in it:
+            name = entry.name
+            if name.startswith(".") or not name.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            if not entry.is_file():
+                continue
+            st = entry.stat()
+            old = previous.get(name)
+            if old and old["size"] == st.st_size and old["mtime_ns"] == st.st_mtime_ns:
+                files[name] = old
+                continue
+            dims = _probe(entry.path)
+            if dims is None:
+                skipped += 1
+                continue
+            files[name] = {
+                "size": st.st_size,
+                "mtime_ns": st.st_mtime_ns,
+                "width": dims[0],
+                "height": dims[1],
+            }
+    return files, skipped
+
+
+def update_manifest(folder, manifest_path=None, full=False, verbose=True, write=True):
+    """
+    Bring the manifest for `folder` up to date and return it.
+
+    Only class folders whose mtime changed (or all, with full=True) are
+    rescanned; the file is rewritten only if something changed.  If
+    `manifest_path` cannot be written the default path is tried, and failing
+    that the manifest is only returned.  With write=False (DDP ranks, which
+    must not race the parent on the file) nothing is saved.
+    """
+    folder = os.path.abspath(folder)
+    fallback_path = default_manifest_path(folder)
+    manifest_path = manifest_path or fallback_path
+    saved_to = manifest_path
+    old = load_manifest(manifest_path)
+    if old is None and fallback_path != manifest_path:
+        # An earlier run may have had to fall back to the default path
+        old = load_manifest(fallback_path)
+        saved_to = fallback_path if old is not None else manifest_path
+    old = old or {}
+    old_dirs = old.get("dirs", {}) if old.get("root") == folder else {}
+
+    class_dirs = []
+    if os.path.isdir(folder):
+        for sub in sorted(os.listdir(folder)):
+            if os.path.isdir(os.path.join(folder, sub)):
+                label = label_for_folder(sub)
+                if label is not None:
+                    class_dirs.append((sub, label))
+    if not class_dirs:
+        class_dirs = [(".", FALLBACK_LABEL)]
+
+    dirs, changed, rescanned = {}, False, 0
+    for rel, label in class_dirs:
+        dir_path = os.path.normpath(os.path.join(folder, rel))
+        mtime_ns = os.stat(dir_path).st_mtime_ns
+        prev = old_dirs.get(rel)
+        if prev and not full and prev["mtime_ns"] == mtime_ns and prev["label"] == label:
+            dirs[rel] = prev
+            continue
+
+        files, skipped = _scan_dir(dir_path, prev["files"] if prev else {})
+        rescanned += 1
+        if skipped and verbose:
+            print(f"Manifest: skipped {skipped} unreadable images in '{rel}'")
+        dirs[rel] = {"mtime_ns": mtime_ns, "label": label, "files": files}
+        changed = changed or prev is None or prev["files"] != files or prev["mtime_ns"] != mtime_ns
+
+    changed = changed or set(dirs) != set(old_dirs)
+    manifest = {"version": MANIFEST_VERSION, "root": folder, "dirs": dirs}
+    if changed:
+        saved_to = _write_manifest(manifest, manifest_path, fallback_path, verbose) if write else None
+    if verbose:
+        status = "unchanged" if not changed else "updated" if saved_to else "not saved"
+        print(f"Manifest: {len(dirs)} folders, {rescanned} rescanned, {status}"
+              f"{f' ({saved_to})' if saved_to else ''}")
+    return manifest
+
+
+def manifest_entries(manifest):
+    """Sorted list of (image_path, label_id, width, height)."""
+    entries = []
+    for rel, d in sorted(manifest["dirs"].items()):
+        base = os.path.normpath(os.path.join(manifest["root"], rel))
+        for name in sorted(d["files"]):
+            f = d["files"][name]
+            entries.append((os.path.join(base, name), d["label"], f["width"], f["height"]))
+    return entries
+
+
+def _percentiles(values, qs=(0, 5, 50, 95, 100)):
+    values = sorted(values)
+    if not values:
+        return {}
+    return {f"p{q}": values[min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))] for q in qs}
+
+
+def manifest_stats(manifest):
+    """Per-class counts plus width/height/megapixel/aspect-ratio distributions."""
+    entries = [
+        (d["label"], f)
+        for d in manifest["dirs"].values()
+        for f in d["files"].values()
+    ]
+    per_label = {}
+    for label, _ in entries:
+        per_label[label] = per_label.get(label, 0) + 1
+
+    aspect_bins = {"<0.75": 0, "0.75-1.0": 0, "1.0-1.33": 0, "1.33-1.78": 0, ">=1.78": 0}
+    for _, f in entries:
+        ar = f["width"] / f["height"] if f["height"] else 0
+        if ar < 0.75:
+            aspect_bins["<0.75"] += 1
+        elif ar < 1.0:
+            aspect_bins["0.75-1.0"] += 1
+        elif ar < 1.33:
+            aspect_bins["1.0-1.33"] += 1
+        elif ar < 1.78:
+            aspect_bins["1.33-1.78"] += 1
+        else:
+            aspect_bins[">=1.78"] += 1
+
+    return {
+        "images":        len(entries),
+        "perClass":      per_label,
+        "width":         _percentiles([f["width"] for _, f in entries]),
+        "height":        _percentiles([f["height"] for _, f in entries]),
+        "megapixels":    _percentiles([round(f["width"] * f["height"] / 1e6, 2) for _, f in entries]),
+        "fileSizeMB":    _percentiles([round(f["size"] / 1e6, 2) for _, f in entries]),
+        "totalSizeMB":   round(sum(f["size"] for _, f in entries) / 1e6, 1),
+        "aspectRatio":   aspect_bins,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create or update a WALL.E training-set manifest")
+    parser.add_argument("folder", help="Dataset folder (class subfolders or a flat folder)")
+    parser.add_argument("--manifest", default=None, help=f"Manifest path (default: under {MANIFEST_DIR})")
+    parser.add_argument("--full", action="store_true", help="Re-check every file, not only changed folders")
+    parser.add_argument("--stats", action="store_true", help="Print size and aspect-ratio statistics")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.folder):
+        print(f"ERROR: {args.folder} is not a directory")
+        sys.exit(1)
+    m = update_manifest(args.folder, args.manifest, full=args.full)
+    if args.stats:
+        print(json.dumps(manifest_stats(m), indent=2))
@@ -0,0 +1,264 @@
+"""
+WALL.E Knowledge Distillation
+=============================
+Trains a compact MobileNetV3-FPN student (get_model at a reduced input size)
+to reproduce the COCO ResNet50-FPN teacher on unlabeled municipal photos.
+
+The pipeline:
+  1. Teacher pass: run the COCO ResNet50-FPN detector once over the unlabeled
+     images and store its confident detections, mapped to the four waste
+     categories, as pseudo-labels in a JSONL file.  Non-waste COCO classes
+     (people, vehicles, animals → "Mixed" in the COCO map) are dropped.
+     The pass appends to the file and skips images already labeled, so it
+     can be resumed.
+  2. Student training: fine-tune get_model(len(WASTE_CLASS_NAMES)) on the
+     pseudo-labels at --min-size / --max-size.
+  3. Save with save_model() including class names and input size, so
+     load_custom_model() can serve the student directly:
+
+         MODEL_CHECKPOINT=checkpoints/student_model.pth python waste_classifier_api.py
+
+The teacher's class space (91 COCO slots) does not match the student's
+(4 waste categories), so distillation uses the teacher's boxes and mapped
+categories as hard targets rather than matching logits.
+
+Run:
+    python distill.py /data/municipal_photos --epochs 10 --min-size 320 --max-size 512
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+import torch
+import torchvision
+import torchvision.transforms as T
+from PIL import Image
+from torch.utils.data import Dataset, DataLoader
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from model import get_model, save_model, model_config, WASTE_CLASS_NAMES
+from waste_category_mapper import COCO_CATEGORY_MAP
+from train import collate_fn, TrainingLog
+from reclassify import list_images
+from image_io import decode_image
+
+CHECKPOINT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "checkpoints")
+
+# COCO label → student class id (waste categories except "Mixed")
+COCO_TO_STUDENT = {
+    label: WASTE_CLASS_NAMES.index(cat)
+    for label, cat in COCO_CATEGORY_MAP.items()
+    if cat != "Mixed"
+}
+
+
+# ─── TEACHER PASS ───────────────────────────────────────────────────────────────
+
+def _done_paths(path):
+    if not os.path.exists(path):
+        return set()
+    with open(path, "r", encoding="utf-8") as f:
+        return {json.loads(line)["path"] for line in f if line.strip()}
+
+
+def _decode(path):
+    # Draft-decode large JPEGs to the teacher's 800/1333 input scale
+    try:
+        return decode_image(path)
+    except Exception as e:
+        print(f"  [SKIP] {path}: {e}")
+        return None
+
+
+def generate_pseudo_labels(image_source, labels_path, device, score_threshold=0.6,
+                           batch_size=4):
+    """Run the COCO teacher over `image_source` and append pseudo-labels to JSONL."""
+    weights = torchvision.models.detection.FasterRCNN_ResNet50_FPN_Weights.DEFAULT
+    teacher = torchvision.models.detection.fasterrcnn_resnet50_fpn(weights=weights).to(device).eval()
+    coco_labels = weights.meta["categories"]
+    to_tensor = T.ToTensor()
+
+    done = _done_paths(labels_path)
+    paths = [p for p in list_images(image_source) if p not in done]
+    print(f"Teacher pass: {len(paths)} images to label ({len(done)} already done)")
+
+    kept = 0
+    t0 = time.perf_counter()
+    with open(labels_path, "a", encoding="utf-8") as out, ThreadPoolExecutor(max_workers=4) as pool:
+        for start in range(0, len(paths), batch_size):
+            chunk = paths[start:start + batch_size]
+            imgs = list(pool.map(_decode, chunk))
+            items = []
+            for p, img in zip(chunk, imgs):
+                if img is None:
+                    # Mark unreadable files done too, or every resume retries them
+                    out.write(json.dumps({"path": p, "boxes": [], "error": "unreadable"}) + "\n")
+                else:
+                    items.append((p, img))
+            if not items:
+                out.flush()
+                continue
+
+            with torch.no_grad():
+                outputs = teacher([to_tensor(img).to(device) for _, img in items])
+
+            for (path, img), det in zip(items, outputs):
+                # Boxes and sizes are stored in original-image coordinates
+                sx, sy = img.info.get("decode_scale", (1.0, 1.0))
+                boxes, labels, scores = [], [], []
+                for box, label, score in zip(det["boxes"].tolist(), det["labels"].tolist(), det["scores"].tolist()):
+                    student_id = COCO_TO_STUDENT.get(coco_labels[label])
+                    if score >= score_threshold and student_id is not None:
+                        x1, y1, x2, y2 = box
+                        boxes.append([round(v, 2) for v in (x1 * sx, y1 * sy, x2 * sx, y2 * sy)])
+                        labels.append(student_id)
+                        scores.append(round(score, 4))
+                # Images without confident waste detections are recorded too
+                # (with empty boxes) so a resumed pass skips them;
+                # PseudoLabelDataset leaves them out unless keep_empty.
+                out.write(json.dumps({
+                    "path": path, "width": round(img.width * sx), "height": round(img.height * sy),
+                    "boxes": boxes, "labels": labels, "scores": scores,
+                }) + "\n")
+                kept += bool(boxes)
+            out.flush()
+
+            if (start // batch_size) % 50 == 0:
+                rate = (start + len(chunk)) / (time.perf_counter() - t0)
+                print(f"  {start + len(chunk)}/{len(paths)} images ({rate:.1f} img/s)")
+
+    print(f"Teacher pass done: {kept} images with pseudo-labels -> {labels_path}")
+
+
+class PseudoLabelDataset(Dataset):
+    """Images with teacher detections as detection targets."""
+
+    def __init__(self, labels_path, keep_empty=False):
+        with open(labels_path, "r", encoding="utf-8") as f:
+            records = [json.loads(line) for line in f if line.strip()]
+        # Empty rows only mark images the teacher has already seen
+        self.records = [r for r in records
+                        if r["boxes"] or (keep_empty and "error" not in r)]
+        self.transform = T.Compose([T.ToTensor()])
+
+    def __len__(self):
+        return len(self.records)
+
+    def __getitem__(self, idx):
+        rec = self.records[idx]
+        img = Image.open(rec["path"]).convert("RGB")
+        boxes = torch.as_tensor(rec["boxes"], dtype=torch.float32).reshape(-1, 4)
+        target = {
+            "boxes": boxes,
+            "labels": torch.as_tensor(rec["labels"], dtype=torch.int64),
+            "image_id": torch.tensor([idx]),
+        }
+        return self.transform(img), target
+
+
+# ─── STUDENT TRAINING ───────────────────────────────────────────────────────────
+
+def distill_model(image_source, epochs=10, lr=0.005, min_size=320, max_size=512,
+                  labels_path=None, output=None, score_threshold=0.6, batch_size=4,
+                  relabel=False, init_from=None):
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    print(f"Distilling on device: {device}")
+
+    labels_path = labels_path or os.path.join(CHECKPOINT_DIR, "pseudo_labels.jsonl")
+    output = output or os.path.join(CHECKPOINT_DIR, "student_model.pth")
+    os.makedirs(os.path.dirname(os.path.abspath(labels_path)), exist_ok=True)
+    if relabel and os.path.exists(labels_path):
+        os.remove(labels_path)
+
+    # 1. Teacher pseudo-labels (resumable)
+    generate_pseudo_labels(image_source, labels_path, device, score_threshold, batch_size)
+    dataset = PseudoLabelDataset(labels_path)
+    if len(dataset) == 0:
+        print("ERROR: The teacher found no waste objects to learn from.")
+        return False
+    data_loader = DataLoader(dataset, batch_size=2, shuffle=True, num_workers=0, collate_fn=collate_fn)
+
+    # 2. Student: MobileNetV3-FPN at reduced input size
+    student = get_model(num_classes=len(WASTE_CLASS_NAMES), pretrained=True,
+                        min_size=min_size, max_size=max_size)
+    if init_from:
+        state = torch.load(init_from, map_location="cpu", weights_only=False)["model_state_dict"]
+        student.load_state_dict(state)
+        print(f"Student initialised from {init_from}")
+    student.to(device)
+
+    params = [p for p in student.parameters() if p.requires_grad]
+    optimizer = torch.optim.SGD(params, lr=lr, momentum=0.9, weight_decay=0.0005)
+    log = TrainingLog(os.path.join(os.path.dirname(os.path.abspath(output)), "distill_log.jsonl"), device)
+
+    student.train()
+    print(f"\nTraining student at {min_size}/{max_size} on {len(dataset)} pseudo-labeled images...")
+    for epoch in range(1, epochs + 1):
+        epoch_loss = 0.0
+        t_ready = time.perf_counter()
+        for step, (images, targets) in enumerate(data_loader, 1):
+            t_batch = time.perf_counter()
+            images = [img.to(device) for img in images]
+            targets = [{k: v.to(device) for k, v in t.items()} for t in targets]
+            log.sync()
+            t_h2d = time.perf_counter()
+
+            loss_dict = student(images, targets)
+            losses = sum(loss for loss in loss_dict.values())
+            log.sync()
+            t_fwd = time.perf_counter()
+
+            optimizer.zero_grad()
+            losses.backward()
+            log.sync()
+            t_bwd = time.perf_counter()
+            optimizer.step()
+            log.sync()
+            t_opt = time.perf_counter()
+
+            step_loss = losses.item()
+            epoch_loss += step_loss
+            log.step(epoch, step, len(images), step_loss, {
+                "dataWait":  t_batch - t_ready,
+                "h2d":       t_h2d - t_batch,
+                "forward":   t_fwd - t_h2d,
+                "backward":  t_bwd - t_fwd,
+                "optimizer": t_opt - t_bwd,
+            })
+            t_ready = time.perf_counter()
+        log.end_epoch(epoch, epochs, epoch_loss / len(data_loader))
+    log.close()
+
+    # 3. Servable checkpoint (class names + input size travel with the weights)
+    extra = model_config(student, WASTE_CLASS_NAMES)
+    extra["distilled_from"] = "fasterrcnn_resnet50_fpn_coco"
+    save_model(student, optimizer, epochs, epoch_loss / len(data_loader), output, extra=extra)
+    print(f"Serve it with: MODEL_CHECKPOINT={output} python waste_classifier_api.py")
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Distil the COCO ResNet50-FPN teacher into a compact student")
+    parser.add_argument("images", help="Folder or manifest of unlabeled municipal photos")
+    parser.add_argument("--epochs", type=int, default=10)
+    parser.add_argument("--lr", type=float, default=0.005)
+    parser.add_argument("--min-size", type=int, default=320, help="Student input: shorter side")
+    parser.add_argument("--max-size", type=int, default=512, help="Student input: longer side cap")
+    parser.add_argument("--score-threshold", type=float, default=0.6, help="Teacher confidence for pseudo-labels")
+    parser.add_argument("--labels", default=None, help="Pseudo-label JSONL (default: checkpoints/pseudo_labels.jsonl)")
+    parser.add_argument("--output", default=None, help="Student checkpoint (default: checkpoints/student_model.pth)")
+    parser.add_argument("--batch-size", type=int, default=4, help="Teacher batch size")
+    parser.add_argument("--relabel", action="store_true", help="Discard existing pseudo-labels first")
+    parser.add_argument("--init-from", default=None, help="Start the student from an existing get_model checkpoint")
+    args = parser.parse_args()
+
+    ok = distill_model(
+        args.images, epochs=args.epochs, lr=args.lr, min_size=args.min_size, max_size=args.max_size,
+        labels_path=args.labels, output=args.output, score_threshold=args.score_threshold,
+        batch_size=args.batch_size, relabel=args.relabel, init_from=args.init_from,
+    )
+    sys.exit(0 if ok else 1)
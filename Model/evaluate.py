@@ -0,0 +1,363 @@
+"""
+WALL.E Accuracy vs Latency Evaluation
+=====================================
+Runs a labeled image set through each model variant, input size and engine,
+and prints a side-by-side Pareto table so the production speed/quality
+trade-off can be chosen with numbers.
+
+Variants:
+    coco          COCO-pretrained Faster RCNN ResNet50-FPN (service fallback)
+    mobilenet     get_model()                  — MobileNetV3-FPN checkpoint
+    resnet50-c5   get_model_custom_backbone()  — ResNet50 single-level checkpoint
+
+Engines: eager, torchscript, onnx (needs onnx + onnxruntime)
+Sizes:   "native" or MINxMAX, e.g. 320x512 (detector resize limits)
+
+Labeled set:
+    • a folder with Dry / Wet / E-Waste / Mixed subfolders (as used by
+      train.py); ground truth is one whole-image box per image
+    • or a JSONL manifest: {"path": ..., "category": "Dry",
+                            "boxes": [[x1, y1, x2, y2], ...],        (optional)
+                            "boxCategories": ["Dry", ...]}           (optional)
+
+Metrics:
+    accuracy   dominant category (same score-weighted vote as the API) vs label
+    mAP@0.5    VOC-style AP over the four waste categories, boxes at IoU 0.5
+    p50/p95/p99  per-image preprocess + forward latency
+
+Run:
+    python evaluate.py Dataset/val --variants coco mobilenet \\
+        --checkpoint checkpoints/best_model.pth \\
+        --sizes native 320x512 --engines eager torchscript --output eval.json
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+
+import numpy as np
+import torch
+import torchvision
+import torchvision.transforms.functional as TF
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from model import get_model, get_model_custom_backbone, WASTE_CLASS_NAMES
+from waste_category_mapper import (
+    map_coco_label_to_waste_category,
+    map_custom_label_to_waste_category,
+    CATEGORY_INFO,
+)
+
+CUSTOM_CSV = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Dataset", "waste", "meta_df.csv")
+MAP_SCORE_FLOOR = 0.05   # detections kept for mAP (accuracy uses --threshold)
+
+
+# ─── DATA ───────────────────────────────────────────────────────────────────────
+
+def load_samples(source, limit=None):
+    """
+    Return [{path, category, boxes, boxCategories}] for a folder or manifest.
+
+    Images are decoded later, one at a time, by evaluate(); only the header
+    is read here for the default whole-image box.
+    """
+    if os.path.isdir(source):
+        from train import CustomWetWasteDataset
+        dataset = CustomWetWasteDataset(source)
+        entries = [{"path": p, "category": WASTE_CLASS_NAMES[label]} for p, label in dataset.image_data]
+    else:
+        with open(source, "r", encoding="utf-8") as f:
+            entries = [json.loads(line) for line in f if line.strip()]
+
+    if limit:
+        entries = entries[:limit]
+
+    samples = []
+    for e in entries:
+        boxes = e.get("boxes")
+        if not boxes:
+            with Image.open(e["path"]) as img:
+                w, h = img.size
+            boxes = [[0.0, 0.0, float(w), float(h)]]
+        samples.append({
+            "path":          e["path"],
+            "category":      e["category"],
+            "boxes":         boxes,
+            "boxCategories": e.get("boxCategories") or [e["category"]] * len(boxes),
+        })
+    return samples
+
+
+# ─── MODELS ─────────────────────────────────────────────────────────────────────
+
+def class_names_for(checkpoint, num_classes):
+    if "class_names" in checkpoint:
+        return list(checkpoint["class_names"])
+    if num_classes == len(WASTE_CLASS_NAMES):
+        return list(WASTE_CLASS_NAMES)
+    if os.path.exists(CUSTOM_CSV):
+        import pandas as pd
+        cats = sorted(pd.read_csv(CUSTOM_CSV)["cat_name"].unique().tolist())
+        return ["__background__"] + cats
+    return ["__background__"] + [f"class_{i}" for i in range(1, num_classes)]
+
+
+def _remember_native_size(m):
+    """Record the variant's own resize limits so apply_size can restore them."""
+    m.native_size = (tuple(m.transform.min_size), m.transform.max_size)
+    return m
+
+
+def build_variant(arch, checkpoint_path, device):
+    """Return (eager model, class labels, label→category mapper, source name)."""
+    if arch == "coco":
+        weights = torchvision.models.detection.FasterRCNN_ResNet50_FPN_Weights.DEFAULT
+        m = _remember_native_size(torchvision.models.detection.fasterrcnn_resnet50_fpn(weights=weights))
+        return m.to(device).eval(), list(weights.meta["categories"]), map_coco_label_to_waste_category, "coco"
+
+    if not checkpoint_path or not os.path.exists(checkpoint_path):
+        raise FileNotFoundError(f"{arch} needs a checkpoint (got {checkpoint_path!r})")
+
+    checkpoint  = torch.load(checkpoint_path, map_location=device, weights_only=False)
+    state       = checkpoint["model_state_dict"]
+    num_classes = state["roi_heads.box_predictor.cls_score.weight"].shape[0]
+    if arch == "mobilenet":
+        m = get_model(num_classes=num_classes, pretrained=False,
+                      min_size=checkpoint.get("min_size", 512), max_size=checkpoint.get("max_size", 768))
+    else:
+        m = get_model_custom_backbone(num_classes=num_classes)
+    m.load_state_dict(state)
+    _remember_native_size(m)
+    return m.to(device).eval(), class_names_for(checkpoint, num_classes), map_custom_label_to_waste_category, "custom"
+
+
+def apply_size(m, size):
+    """Set the detector's resize limits; "native" restores the variant's own."""
+    if size == "native":
+        m.transform.min_size, m.transform.max_size = m.native_size
+        return
+    min_size, max_size = (int(v) for v in size.lower().split("x"))
+    m.transform.min_size = (min_size,)
+    m.transform.max_size = max_size
+
+
+def wrap_engine(m, engine, labels, source, workdir):
+    """Return a callable detector for `engine` built from eager model `m`."""
+    if engine == "eager":
+        return m
+    if engine == "torchscript":
+        from model_cache import ScriptedDetector
+        return ScriptedDetector(torch.jit.script(m))
+    if engine == "onnx":
+        from export_onnx import export
+        from onnx_backend import OnnxDetector
+        path = os.path.join(workdir, f"model-{id(m)}-{time.time_ns()}.onnx")
+        export(m, path, 17, labels, source)
+        return OnnxDetector(path, intra_op_threads=torch.get_num_threads())
+    raise ValueError(f"Unknown engine: {engine}")
+
+
+# ─── METRICS ────────────────────────────────────────────────────────────────────
+
+def _iou(a, b):
+    ix1, iy1 = max(a[0], b[0]), max(a[1], b[1])
+    ix2, iy2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0.0, ix2 - ix1) * max(0.0, iy2 - iy1)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def dominant_category(dets, threshold):
+    """Score-weighted vote, matching aggregate_waste_category in the API."""
+    votes = {}
+    for cat, score, _ in dets:
+        if score >= threshold:
+            votes[cat] = votes.get(cat, 0.0) + score
+    return max(votes, key=votes.get) if votes else "Mixed"
+
+
+def average_precision(per_image_dets, samples, category, iou_thr=0.5):
+    """VOC all-point AP for one category; None if it has no ground truth."""
+    gts = [
+        [box for box, cat in zip(s["boxes"], s["boxCategories"]) if cat == category]
+        for s in samples
+    ]
+    n_gt = sum(len(g) for g in gts)
+    if n_gt == 0:
+        return None
+
+    preds = [
+        (score, i, box)
+        for i, dets in enumerate(per_image_dets)
+        for cat, score, box in dets if cat == category
+    ]
+    preds.sort(key=lambda p: -p[0])
+    used = [[False] * len(g) for g in gts]
+    tp = np.zeros(len(preds))
+    for k, (_, i, box) in enumerate(preds):
+        best, best_j = iou_thr, -1
+        for j, gt in enumerate(gts[i]):
+            if not used[i][j]:
+                iou = _iou(box, gt)
+                if iou >= best:
+                    best, best_j = iou, j
+        if best_j >= 0:
+            used[i][best_j] = True
+            tp[k] = 1
+
+    if not len(preds):
+        return 0.0
+    ctp = np.cumsum(tp)
+    recall = ctp / n_gt
+    precision = ctp / np.arange(1, len(preds) + 1)
+    # Precision envelope, then integrate over recall steps.
+    mrec = np.concatenate([[0.0], recall, [1.0]])
+    mpre = np.concatenate([[0.0], precision, [0.0]])
+    for i in range(len(mpre) - 2, -1, -1):
+        mpre[i] = max(mpre[i], mpre[i + 1])
+    idx = np.where(mrec[1:] != mrec[:-1])[0]
+    return float(np.sum((mrec[idx + 1] - mrec[idx]) * mpre[idx + 1]))
+
+
+def _load_rgb(path):
+    with Image.open(path) as img:
+        return img.convert("RGB")
+
+
+def evaluate(detector, labels, mapper, samples, device, threshold, warmup):
+    for s in samples[:warmup]:
+        with torch.no_grad():
+            detector([TF.to_tensor(_load_rgb(s["path"])).to(device)])
+
+    latencies, per_image = [], []
+    for s in samples:
+        # Decode outside the timed region; only one image is held at a time
+        img = _load_rgb(s["path"])
+        start = time.perf_counter()
+        tensor = TF.to_tensor(img).to(device)
+        with torch.no_grad():
+            out = detector([tensor])[0]
+        if device.type == "cuda":
+            torch.cuda.synchronize()
+        latencies.append((time.perf_counter() - start) * 1000.0)
+
+        dets = []
+        for box, label, score in zip(out["boxes"].tolist(), out["labels"].tolist(), out["scores"].tolist()):
+            name = labels[label] if label < len(labels) else f"class_{label}"
+            if score < MAP_SCORE_FLOOR or name in ("N/A", "__background__"):
+                continue
+            dets.append((mapper(name), score, box))
+        per_image.append(dets)
+
+    correct = sum(dominant_category(d, threshold) == s["category"] for d, s in zip(per_image, samples))
+    aps = {c: average_precision(per_image, samples, c) for c in CATEGORY_INFO}
+    valid = [ap for ap in aps.values() if ap is not None]
+    lat = np.array(latencies)
+    return {
+        "accuracy": round(correct / len(samples), 4),
+        "mAP50":    round(float(np.mean(valid)), 4) if valid else None,
+        "apPerCategory": {c: (round(ap, 4) if ap is not None else None) for c, ap in aps.items()},
+        "p50Ms":    round(float(np.percentile(lat, 50)), 1),
+        "p95Ms":    round(float(np.percentile(lat, 95)), 1),
+        "p99Ms":    round(float(np.percentile(lat, 99)), 1),
+        "meanMs":   round(float(lat.mean()), 1),
+    }
+
+
+def mark_pareto(rows):
+    """Flag rows not dominated on (higher accuracy, lower p50 latency)."""
+    for r in rows:
+        r["pareto"] = not any(
+            o is not r
+            and o["accuracy"] >= r["accuracy"] and o["p50Ms"] <= r["p50Ms"]
+            and (o["accuracy"] > r["accuracy"] or o["p50Ms"] < r["p50Ms"])
+            for o in rows
+        )
+
+
+def print_table(rows):
+    header = f"{'variant':<12} {'engine':<12} {'size':<10} {'acc':>6} {'mAP50':>6} {'p50ms':>8} {'p95ms':>8} {'p99ms':>8}  pareto"
+    print("\n" + header)
+    print("-" * len(header))
+    for r in sorted(rows, key=lambda r: r["p50Ms"]):
+        m = f"{r['mAP50']:.3f}" if r["mAP50"] is not None else "  -  "
+        print(f"{r['variant']:<12} {r['engine']:<12} {r['size']:<10} {r['accuracy']:>6.3f} {m:>6} "
+              f"{r['p50Ms']:>8.1f} {r['p95Ms']:>8.1f} {r['p99Ms']:>8.1f}  {'*' if r['pareto'] else ''}")
+
+
+def main():
+    default_ckpt = os.path.join(os.path.dirname(os.path.abspath(__file__)), "checkpoints", "best_model.pth")
+    parser = argparse.ArgumentParser(description="Accuracy vs latency across WALL.E model variants")
+    parser.add_argument("data", help="Labeled folder (class subfolders) or JSONL manifest")
+    parser.add_argument("--variants", nargs="+", default=["coco", "mobilenet"],
+                        choices=["coco", "mobilenet", "resnet50-c5"])
+    parser.add_argument("--checkpoint", default=default_ckpt, help="Checkpoint for the mobilenet variant")
+    parser.add_argument("--custom-backbone-checkpoint", default=None, help="Checkpoint for resnet50-c5")
+    parser.add_argument("--sizes", nargs="+", default=["native"], help="native or MINxMAX, e.g. 320x512")
+    parser.add_argument("--engines", nargs="+", default=["eager"], choices=["eager", "torchscript", "onnx"])
+    parser.add_argument("--threshold", type=float, default=0.4, help="Confidence cutoff for the category vote")
+    parser.add_argument("--limit", type=int, default=None, help="Evaluate only the first N images")
+    parser.add_argument("--warmup", type=int, default=3, help="Untimed warm-up images per configuration")
+    parser.add_argument("--threads", type=int, default=None, help="torch intra-op threads")
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--output", default=None, help="Write results as .json or .csv")
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    device = torch.device(args.device)
+
+    samples = load_samples(args.data, args.limit)
+    if not samples:
+        print("ERROR: no labeled images found.")
+        sys.exit(1)
+    print(f"  Evaluating on {len(samples)} images")
+
+    checkpoints = {"mobilenet": args.checkpoint, "resnet50-c5": args.custom_backbone_checkpoint}
+    rows = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for arch in args.variants:
+            try:
+                base, labels, mapper, source = build_variant(arch, checkpoints.get(arch), device)
+            except Exception as e:
+                print(f"  [SKIP] {arch}: {e}")
+                continue
+            for size in args.sizes:
+                apply_size(base, size)
+                for engine in args.engines:
+                    try:
+                        detector = wrap_engine(base, engine, labels, source, workdir)
+                    except Exception as e:
+                        print(f"  [SKIP] {arch}/{engine}/{size}: {e}")
+                        continue
+                    print(f"  Running {arch} / {engine} / {size} ...")
+                    metrics = evaluate(detector, labels, mapper, samples, device, args.threshold, args.warmup)
+                    rows.append({"variant": arch, "engine": engine, "size": size, **metrics})
+
+    if not rows:
+        print("ERROR: no configuration could be evaluated.")
+        sys.exit(1)
+
+    mark_pareto(rows)
+    print_table(rows)
+
+    if args.output:
+        if args.output.endswith(".csv"):
+            import csv
+            fields = ["variant", "engine", "size", "accuracy", "mAP50", "p50Ms", "p95Ms", "p99Ms", "meanMs", "pareto"]
+            with open(args.output, "w", newline="", encoding="utf-8") as f:
+                writer = csv.DictWriter(f, fieldnames=fields, extrasaction="ignore")
+                writer.writeheader()
+                writer.writerows(rows)
+        else:
+            with open(args.output, "w", encoding="utf-8") as f:
+                json.dump({"images": len(samples), "results": rows}, f, indent=2)
+        print(f"\n  [OK] Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+WALL.E ONNX Export
+==================
+Exports the detector the API would serve (custom checkpoint via get_model, or
+the COCO ResNet50-FPN fallback) to ONNX with dynamic image height/width, and
+optionally checks parity against PyTorch with ONNX Runtime.
+
+Run:
+    python export_onnx.py --source coco   --output checkpoints/model.onnx
+    python export_onnx.py --source custom --output checkpoints/model.onnx \\
+        --verify samples/bottle.jpg samples/banana.jpg
+
+Serve the export with:
+    INFERENCE_BACKEND=onnx ONNX_MODEL=checkpoints/model.onnx python waste_classifier_api.py
+"""
+
+import os
+import sys
+import inspect
+import argparse
+
+
+def export(detector, output, opset, class_labels, model_source):
+    import torch
+    import torchvision
+    from onnx_backend import write_metadata
+
+    detector = detector.to("cpu").eval()
+    sample = [torch.rand(3, 480, 640)]
+
+    # torchvision detectors export through the TorchScript-based exporter;
+    # newer torch defaults to the dynamo exporter, which cannot trace them.
+    legacy = {"dynamo": False} if "dynamo" in inspect.signature(torch.onnx.export).parameters else {}
+    torch.onnx.export(
+        detector,
+        (sample,),
+        output,
+        opset_version=opset,
+        do_constant_folding=True,
+        input_names=["image"],
+        output_names=["boxes", "labels", "scores"],
+        dynamic_axes={
+            "image":  {1: "height", 2: "width"},
+            "boxes":  {0: "detections"},
+            "labels": {0: "detections"},
+            "scores": {0: "detections"},
+        },
+        **legacy,
+    )
+    write_metadata(output, {
+        "modelSource": model_source,
+        "classLabels": list(class_labels),
+        "minSize":     list(detector.transform.min_size),
+        "maxSize":     detector.transform.max_size,
+        "opset":       opset,
+        "torch":       torch.__version__,
+        "torchvision": torchvision.__version__,
+    })
+    print(f"  [OK] Exported {model_source} detector -> {output}")
+
+
+def _box_iou(a, b):
+    ix1, iy1 = max(a[0], b[0]), max(a[1], b[1])
+    ix2, iy2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0.0, ix2 - ix1) * max(0.0, iy2 - iy1)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def verify(detector, output, images, min_score, score_tol, iou_min):
+    """
+    Compare PyTorch and ONNX Runtime outputs on sample images.
+
+    Every PyTorch detection scoring >= min_score must have an ONNX detection
+    with the same label, IoU >= iou_min and a score within score_tol (and
+    vice versa).  Returns True when all images match.
+    """
+    import torch
+    from PIL import Image
+    import torchvision.transforms.functional as TF
+    from onnx_backend import OnnxDetector
+
+    detector = detector.to("cpu").eval()
+    session = OnnxDetector(output)
+    all_ok = True
+
+    for path in images:
+        tensor = TF.to_tensor(Image.open(path).convert("RGB"))
+        with torch.no_grad():
+            ref = detector([tensor])[0]
+        got = session([tensor])[0]
+
+        def keep(out):
+            mask = out["scores"] >= min_score
+            return list(zip(out["boxes"][mask].tolist(),
+                            out["labels"][mask].tolist(),
+                            out["scores"][mask].tolist()))
+
+        ref_dets, got_dets = keep(ref), keep(got)
+
+        def unmatched(src, dst):
+            missing, worst = 0, 0.0
+            for box, label, score in src:
+                best = None
+                for obox, olabel, oscore in dst:
+                    if olabel == label and _box_iou(box, obox) >= iou_min:
+                        diff = abs(score - oscore)
+                        best = diff if best is None else min(best, diff)
+                if best is None or best > score_tol:
+                    missing += 1
+                if best is not None:
+                    worst = max(worst, best)
+            return missing, worst
+
+        miss_fwd, worst_fwd = unmatched(ref_dets, got_dets)
+        miss_bwd, worst_bwd = unmatched(got_dets, ref_dets)
+        ok = miss_fwd == 0 and miss_bwd == 0
+        all_ok &= ok
+        print(f"  [{'OK' if ok else 'MISMATCH'}] {path}: torch={len(ref_dets)} onnx={len(got_dets)} "
+              f"unmatched={miss_fwd}/{miss_bwd} max|dscore|={max(worst_fwd, worst_bwd):.5f}")
+
+    return all_ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the WALL.E detector to ONNX")
+    parser.add_argument("--source", choices=["auto", "custom", "coco"], default="auto",
+                        help="Which model to export (same selection rules as the API)")
+    parser.add_argument("--checkpoint", default=None, help="Custom checkpoint (default: checkpoints/best_model.pth)")
+    parser.add_argument("--output", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "checkpoints", "model.onnx"))
+    parser.add_argument("--opset", type=int, default=17)
+    parser.add_argument("--verify", nargs="*", default=None, metavar="IMAGE",
+                        help="Sample images for the PyTorch/ONNX parity check")
+    parser.add_argument("--min-score", type=float, default=0.3, help="Parity: ignore detections below this score")
+    parser.add_argument("--score-tol", type=float, default=1e-3, help="Parity: max allowed score difference")
+    parser.add_argument("--iou-min", type=float, default=0.95, help="Parity: min IoU for matching boxes")
+    parser.add_argument("--skip-export", action="store_true", help="Only run the parity check on an existing export")
+    args = parser.parse_args()
+
+    # Load the model exactly as the API would, but always in eager PyTorch.
+    os.environ["INFERENCE_BACKEND"] = "torch"
+    os.environ["MODEL_SOURCE"] = args.source
+    os.environ.setdefault("INFERENCE_MAX_CONCURRENCY", "1")
+    if args.checkpoint:
+        os.environ["MODEL_CHECKPOINT"] = os.path.abspath(args.checkpoint)
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import waste_classifier_api as api
+
+    if args.source != "auto" and api.model_source != args.source:
+        print(f"ERROR: requested {args.source} model but the API loaded {api.model_source}.")
+        sys.exit(1)
+
+    if not args.skip_export:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        export(api.model, args.output, args.opset, api.class_labels, api.model_source)
+
+    if args.verify:
+        ok = verify(api.model, args.output, args.verify, args.min_score, args.score_tol, args.iou_min)
+        print("  [OK] ONNX Runtime matches PyTorch" if ok else "  [FAIL] ONNX Runtime output differs from PyTorch")
+        sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Header probe and reduced-scale JPEG decode
+==========================================
+Shared by the API's request intake (open_image) and the offline tools
+(reclassify.py, classify_video.py, distill.py), so a file decodes to the same
+pixels, and its boxes come back at the same scale, whichever path scores it.
+
+    • the image size is read from the header and checked against a pixel
+      limit before any pixel data is decoded
+    • a JPEG much larger than the detector input is decoded at 1/2, 1/4 or
+      1/8 scale via Image.draft(); the decoded image records the factor in
+      img.info["decode_scale"] so boxes can be mapped back
+
+The pixel budget for concurrent requests stays in the API; this module only
+decodes.
+"""
+
+from PIL import Image
+
+# Detector resize limits used when the caller does not know its model's
+DEFAULT_MIN_SIZE = 800
+DEFAULT_MAX_SIZE = 1333
+
+
+class ImageTooLargeError(Exception):
+    """Image exceeds the configured size limits (HTTP 413)."""
+
+
+def probe_image(img: Image.Image, max_pixels=None):
+    """Validate header dimensions of a lazily opened image; no pixels decoded."""
+    width, height = img.size
+    if width <= 0 or height <= 0:
+        raise ValueError("Image has invalid dimensions")
+    if max_pixels and width * height > max_pixels:
+        raise ImageTooLargeError(
+            f"Image is {width}x{height} ({width * height} pixels); "
+            f"the limit is {max_pixels} pixels"
+        )
+    return width, height
+
+
+def open_drafted(fp, min_size=DEFAULT_MIN_SIZE, max_size=DEFAULT_MAX_SIZE, max_pixels=None):
+    """
+    Open `fp` lazily, probe it and configure a draft decode.
+
+    Returns (img, (width, height)) where the size is the original one; the
+    caller decodes with img.convert("RGB") and must close img.
+    """
+    try:
+        img = Image.open(fp)
+    except Image.DecompressionBombError as e:
+        raise ImageTooLargeError(str(e))
+    except Image.UnidentifiedImageError as e:
+        raise ValueError(f"Unsupported or corrupt image: {e}")
+
+    try:
+        width, height = probe_image(img, max_pixels)
+        if img.format == "JPEG":
+            # Ask the JPEG decoder for the smallest DCT scale that still covers
+            # what the detector's own resize step would produce.
+            scale = min(min_size / min(width, height), max_size / max(width, height))
+            if scale < 0.5:
+                img.draft("RGB", (int(width * scale) + 1, int(height * scale) + 1))
+    except Exception:
+        img.close()
+        raise
+    return img, (width, height)
+
+
+def finish_decode(img: Image.Image, original_size):
+    """Decode a drafted image to RGB and record its decode scale; closes img."""
+    try:
+        rgb = img.convert("RGB")
+    finally:
+        img.close()
+    width, height = original_size
+    if rgb.size != (width, height):
+        rgb.info["decode_scale"] = (width / rgb.size[0], height / rgb.size[1])
+    return rgb
+
+
+def decode_image(fp, min_size=DEFAULT_MIN_SIZE, max_size=DEFAULT_MAX_SIZE, max_pixels=None):
+    """Probe and decode `fp` to RGB at the smallest scale the detector needs."""
+    img, size = open_drafted(fp, min_size, max_size, max_pixels)
+    return finish_decode(img, size)
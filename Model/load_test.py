@@ -0,0 +1,523 @@
+"""
+WALL.E Load Test
+================
+Drives the classification service under concurrent load so instance sizes
+and serving modes can be compared with numbers.
+
+The harness:
+  1. Writes a seeded random-weight get_model() checkpoint (no downloads) and
+     starts waste_classifier_api.py on a free local port with it
+  2. Generates seeded synthetic JPEGs at realistic photo sizes
+  3. Replays a weighted mix of requests from an asyncio client:
+       multipart   POST /classify        'image' file field
+       base64      POST /classify        {"image_base64": ...}
+       path        POST /classify/path   {"image_path": ...}
+       uds         Unix-socket binary transport (uds_transport.py)
+  4. Steps through concurrency levels; each level runs --warmup seconds
+     unmeasured, then --duration seconds measured
+  5. Reports throughput, p50/p95/p99 latency and error rates per level, the
+     server's governor/quality state after each level, and the saturation
+     point: the lowest level within --min-gain of the best throughput seen
+     before errors passed --max-error-rate or p95 passed --slo-ms
+
+The model weights, images and per-worker request sequences are derived from
+--seed, so runs are reproducible offline.  The client runs on the same
+machine as the server and takes some CPU from it.
+
+Run:
+    python load_test.py
+    python load_test.py --concurrency 1 2 4 8 16 32 --duration 30 \\
+        --mix multipart=6 base64=2 path=2 --output loadtest.json
+    python load_test.py --server-env QUALITY_MODE=full INFERENCE_MAX_CONCURRENCY=2
+    python load_test.py --url http://localhost:5001   # an already running service
+"""
+
+import os
+import sys
+import io
+import json
+import time
+import base64
+import random
+import socket
+import asyncio
+import argparse
+import platform
+import shutil
+import tempfile
+import subprocess
+import urllib.request
+from urllib.parse import urlparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+API_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "waste_classifier_api.py")
+KINDS = ("multipart", "base64", "path", "uds")
+
+
+# ─── SYNTHETIC INPUTS ───────────────────────────────────────────────────────────
+
+def make_image(rng, width, height, quality=85):
+    """JPEG bytes of a photo-like scene: gradient, shapes and sensor noise."""
+    from PIL import Image, ImageDraw
+
+    base = rng.integers(40, 220, size=(2, 3))
+    ramp = np.linspace(0.0, 1.0, height, dtype=np.float32)[:, None, None]
+    pixels = base[0] + (base[1] - base[0]) * ramp
+    pixels = np.broadcast_to(pixels, (height, width, 3)).copy()
+    img = Image.fromarray(pixels.astype(np.uint8))
+
+    draw = ImageDraw.Draw(img)
+    for _ in range(int(rng.integers(4, 12))):
+        x0, x1 = sorted(rng.integers(0, width, size=2))
+        y0, y1 = sorted(rng.integers(0, height, size=2))
+        color = tuple(int(c) for c in rng.integers(0, 256, size=3))
+        if rng.random() < 0.5:
+            draw.rectangle([x0, y0, x1, y1], fill=color)
+        else:
+            draw.ellipse([x0, y0, x1, y1], fill=color)
+
+    noisy = np.asarray(img, dtype=np.int16) + rng.normal(0, 6, size=(height, width, 3)).astype(np.int16)
+    img = Image.fromarray(np.clip(noisy, 0, 255).astype(np.uint8))
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", quality=quality)
+    return buf.getvalue()
+
+
+def parse_weighted(items, cast=str):
+    """['a=3', 'b'] → [(a, 3.0), (b, 1.0)]"""
+    parsed = []
+    for item in items:
+        name, _, weight = item.partition("=")
+        parsed.append((cast(name), float(weight or 1)))
+    return parsed
+
+
+def parse_size(text):
+    w, h = text.lower().split("x")
+    return int(w), int(h)
+
+
+def build_images(sizes, per_size, seed, workdir):
+    """Write `per_size` images for each (w, h) and return [{path, bytes, size, weight}]."""
+    rng = np.random.default_rng(seed)
+    images = []
+    for (w, h), weight in sizes:
+        for i in range(per_size):
+            data = make_image(rng, w, h)
+            path = os.path.join(workdir, f"load_{w}x{h}_{i}.jpg")
+            with open(path, "wb") as f:
+                f.write(data)
+            images.append({"path": path, "bytes": data, "size": f"{w}x{h}", "weight": weight / per_size})
+    return images
+
+
+def build_requests(images, threshold):
+    """Pre-encode every request body so the client does no work per request."""
+    from uds_transport import REQUEST_HEADER, MAGIC, VERSION
+
+    boundary = "walleloadtest7f3a"
+    for img in images:
+        name = os.path.basename(img["path"])
+        multipart = (
+            f"--{boundary}\r\n"
+            f'Content-Disposition: form-data; name="image"; filename="{name}"\r\n'
+            "Content-Type: image/jpeg\r\n\r\n"
+        ).encode("ascii") + img["bytes"] + f"\r\n--{boundary}--\r\n".encode("ascii")
+        b64 = base64.b64encode(img["bytes"]).decode("ascii")
+        img["requests"] = {
+            "multipart": ("POST", f"/classify?threshold={threshold}", f"multipart/form-data; boundary={boundary}", multipart),
+            "base64":    ("POST", f"/classify?threshold={threshold}", "application/json",
+                          json.dumps({"image_base64": b64}).encode("utf-8")),
+            "path":      ("POST", "/classify/path", "application/json",
+                          json.dumps({"image_path": img["path"], "threshold": threshold}).encode("utf-8")),
+            "uds":       REQUEST_HEADER.pack(MAGIC, VERSION, 0, 0, threshold, len(img["bytes"])) + img["bytes"],
+        }
+
+
+# ─── SERVER ─────────────────────────────────────────────────────────────────────
+
+def make_random_model(seed, **kwargs):
+    """
+    Seeded random-weight get_model() detector with usable activations.
+
+    Untrained MobileNetV3 activations shrink towards zero layer by layer, so
+    every proposal would get the same features and score.  One calibration
+    pass sets each frozen BatchNorm's statistics to those of its input, which
+    keeps features (and so scores, boxes and NMS work) varied like a real
+    model's.
+    """
+    import torch
+    from torchvision.ops.misc import FrozenBatchNorm2d
+    from model import get_model, WASTE_CLASS_NAMES
+
+    torch.manual_seed(seed)
+    model = get_model(num_classes=len(WASTE_CLASS_NAMES), pretrained=False, **kwargs).eval()
+
+    def calibrate(module, inputs):
+        x = inputs[0]
+        module.running_mean.copy_(x.mean(dim=(0, 2, 3)))
+        module.running_var.copy_(x.var(dim=(0, 2, 3)))
+
+    hooks = [m.register_forward_pre_hook(calibrate) for m in model.modules() if isinstance(m, FrozenBatchNorm2d)]
+    try:
+        with torch.no_grad():
+            model([torch.rand(3, 480, 640)])
+    finally:
+        for h in hooks:
+            h.remove()
+    return model
+
+
+def make_random_checkpoint(path, seed):
+    """Seeded random-weight checkpoint the API can serve (see make_random_model)."""
+    import torch
+    from model import save_model, model_config, WASTE_CLASS_NAMES
+
+    model = make_random_model(seed)
+    optimizer = torch.optim.SGD(model.parameters(), lr=0.0)
+    save_model(model, optimizer, 0, 0.0, path, extra=model_config(model, WASTE_CLASS_NAMES))
+
+
+def _free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def get_json(url, timeout=5):
+    with urllib.request.urlopen(url, timeout=timeout) as resp:
+        return json.loads(resp.read().decode("utf-8"))
+
+
+def start_server(workdir, seed, server_env, uds_path=None, startup_timeout=300):
+    """Start the API on a free port; returns (process, base_url)."""
+    checkpoint = os.path.join(workdir, "random_model.pth")
+    make_random_checkpoint(checkpoint, seed)
+
+    port = _free_port()
+    env = {
+        **os.environ,
+        "PORT":              str(port),
+        "MODEL_SOURCE":      "custom",
+        "MODEL_CHECKPOINT":  checkpoint,
+        "INFERENCE_BACKEND": "torch",
+        "MODEL_CACHE":       "0",
+        "PYTHONUNBUFFERED":  "1",
+        **server_env,
+    }
+    if uds_path:
+        env["UDS_PATH"] = uds_path
+
+    log_path = os.path.join(workdir, "server.log")
+    with open(log_path, "w", encoding="utf-8") as log:
+        proc = subprocess.Popen([sys.executable, API_SCRIPT], env=env, stdout=log, stderr=subprocess.STDOUT)
+    base_url = f"http://127.0.0.1:{port}"
+
+    deadline = time.monotonic() + startup_timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            break
+        try:
+            health = get_json(f"{base_url}/health", timeout=2)
+            if health.get("modelSource") == "custom" and (not uds_path or os.path.exists(uds_path)):
+                return proc, base_url
+        except OSError:
+            pass
+        time.sleep(0.5)
+
+    proc.kill()
+    with open(log_path, "r", encoding="utf-8") as f:
+        tail = f.read()[-3000:]
+    raise SystemExit(f"ERROR: the API did not come up with the random-weight model.\n{tail}")
+
+
+# ─── CLIENT ─────────────────────────────────────────────────────────────────────
+
+async def send_http(host, port, request, timeout):
+    """One request on a fresh connection (the Flask server closes after each)."""
+    method, path, content_type, body = request
+    head = (
+        f"{method} {path} HTTP/1.1\r\n"
+        f"Host: {host}:{port}\r\n"
+        f"Content-Type: {content_type}\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        "Connection: close\r\n\r\n"
+    ).encode("ascii")
+    reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+    try:
+        writer.write(head)
+        writer.write(body)
+        await writer.drain()
+        data = await asyncio.wait_for(reader.read(), timeout)
+    finally:
+        writer.close()
+    return int(data.split(b" ", 2)[1])
+
+
+class UdsConnection:
+    """Persistent asyncio connection to the binary transport."""
+
+    def __init__(self, path):
+        self.path = path
+        self.reader = self.writer = None
+
+    async def send(self, payload, timeout):
+        from uds_transport import RESPONSE_HEADER
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_unix_connection(self.path)
+        try:
+            self.writer.write(payload)
+            await self.writer.drain()
+            header = await asyncio.wait_for(self.reader.readexactly(RESPONSE_HEADER.size), timeout)
+            _, _, status, length = RESPONSE_HEADER.unpack(header)
+            await asyncio.wait_for(self.reader.readexactly(length), timeout)
+        except BaseException:
+            self.close()
+            raise
+        if status != 200:
+            self.close()
+        return status
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.reader = self.writer = None
+
+
+async def run_step(target, images, mix, concurrency, warmup, duration, seed, timeout):
+    """Run one concurrency level; returns (records, measured seconds)."""
+    loop = asyncio.get_running_loop()
+    t_measure = loop.time() + warmup
+    t_end = t_measure + duration
+    kinds, kind_weights = zip(*mix)
+    image_weights = [img["weight"] for img in images]
+    records = []
+
+    async def worker(i):
+        rng = random.Random(f"{seed}:{concurrency}:{i}")
+        uds = UdsConnection(target["uds"]) if "uds" in kinds else None
+        try:
+            while loop.time() < t_end:
+                kind = rng.choices(kinds, kind_weights)[0]
+                img = rng.choices(images, image_weights)[0]
+                t0 = loop.time()
+                try:
+                    if kind == "uds":
+                        status = await uds.send(img["requests"]["uds"], timeout)
+                    else:
+                        status = await send_http(target["host"], target["port"], img["requests"][kind], timeout)
+                except asyncio.TimeoutError:
+                    status = "timeout"
+                except (OSError, asyncio.IncompleteReadError, ValueError, IndexError):
+                    status = "connection"
+                if t0 >= t_measure:
+                    records.append((kind, img["size"], status, loop.time() - t0))
+        finally:
+            if uds:
+                uds.close()
+
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    return records, max(loop.time() - t_measure, 1e-9)
+
+
+# ─── REPORT ─────────────────────────────────────────────────────────────────────
+
+def _latency(values):
+    if not values:
+        return {"p50Ms": None, "p95Ms": None, "p99Ms": None, "meanMs": None}
+    ms = np.asarray(values) * 1000
+    return {
+        "p50Ms":  round(float(np.percentile(ms, 50)), 1),
+        "p95Ms":  round(float(np.percentile(ms, 95)), 1),
+        "p99Ms":  round(float(np.percentile(ms, 99)), 1),
+        "meanMs": round(float(ms.mean()), 1),
+    }
+
+
+def summarize_step(concurrency, records, elapsed):
+    ok = [lat for _, _, status, lat in records if status == 200]
+    errors = {}
+    for _, _, status, _ in records:
+        if status != 200:
+            errors[str(status)] = errors.get(str(status), 0) + 1
+
+    per_kind = {}
+    for kind in sorted({r[0] for r in records}):
+        rows = [r for r in records if r[0] == kind]
+        per_kind[kind] = {
+            "requests": len(rows),
+            "errors":   sum(1 for r in rows if r[2] != 200),
+            **_latency([r[3] for r in rows if r[2] == 200]),
+        }
+
+    return {
+        "concurrency":   concurrency,
+        "requests":      len(records),
+        "ok":            len(ok),
+        "errorRate":     round(1 - len(ok) / len(records), 4) if records else 0.0,
+        "errors":        errors,
+        "throughputRps": round(len(ok) / elapsed, 2),
+        **_latency(ok),
+        "perKind":       per_kind,
+    }
+
+
+def find_saturation(steps, min_gain, max_error_rate, slo_ms=None):
+    """
+    Lowest level whose throughput is within `min_gain` of the best level
+    seen before errors passed `max_error_rate` or p95 broke `slo_ms`.
+    """
+    valid, stop = [], None
+    for step in steps:
+        if step["errorRate"] > max_error_rate:
+            stop = f"error rate {step['errorRate']:.1%} at concurrency {step['concurrency']}"
+        elif slo_ms and step["p95Ms"] is not None and step["p95Ms"] > slo_ms:
+            stop = f"p95 {step['p95Ms']} ms over the {slo_ms} ms SLO at concurrency {step['concurrency']}"
+        if stop:
+            break
+        valid.append(step)
+    if not valid:
+        return {"concurrency": None, "throughputRps": None, "p95Ms": None,
+                "reason": stop or "no levels were run"}
+
+    peak = max(s["throughputRps"] for s in valid)
+    sat = next(s for s in valid if s["throughputRps"] * (1 + min_gain) >= peak)
+    if stop:
+        reason = stop
+    elif sat is steps[-1]:
+        reason = "highest level tested; add higher --concurrency levels to confirm"
+    else:
+        reason = f"higher levels add less than {min_gain:.0%} throughput"
+    return {"concurrency": sat["concurrency"], "throughputRps": sat["throughputRps"],
+            "p95Ms": sat["p95Ms"], "reason": reason}
+
+
+def print_table(steps, saturation):
+    header = f"{'conc':>5} {'req':>7} {'rps':>8} {'p50ms':>8} {'p95ms':>8} {'p99ms':>8} {'err%':>6}  quality  limit"
+    print("\n" + header)
+    print("-" * len(header))
+    fmt = lambda v: f"{v:>8.1f}" if v is not None else f"{'-':>8}"
+    for s in steps:
+        server = s.get("server", {})
+        print(f"{s['concurrency']:>5} {s['requests']:>7} {s['throughputRps']:>8.2f} {fmt(s['p50Ms'])} "
+              f"{fmt(s['p95Ms'])} {fmt(s['p99Ms'])} {s['errorRate'] * 100:>6.1f}  "
+              f"{server.get('quality', '-'):<8} {server.get('limit', '-')}")
+    if saturation["concurrency"] is not None:
+        print(f"\nSaturation: concurrency {saturation['concurrency']} "
+              f"({saturation['throughputRps']} req/s, p95 {saturation['p95Ms']} ms); {saturation['reason']}")
+    else:
+        print(f"\nSaturation: {saturation['reason']}")
+
+
+def server_state(base_url):
+    try:
+        health = get_json(f"{base_url}/health")
+    except OSError:
+        return {}
+    return {
+        "quality":   health.get("quality", {}).get("current"),
+        "limit":     health.get("inference", {}).get("limit"),
+        "inference": health.get("inference"),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent load test for the WALL.E classification service")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16], help="Concurrency levels to step through")
+    parser.add_argument("--duration", type=float, default=20, help="Measured seconds per level")
+    parser.add_argument("--warmup", type=float, default=3, help="Unmeasured seconds at the start of each level")
+    parser.add_argument("--pause", type=float, default=5, help="Idle seconds between levels (lets the quality ladder recover)")
+    parser.add_argument("--mix", nargs="+", default=["multipart=6", "base64=2", "path=2"],
+                        help=f"Weighted request kinds from {', '.join(KINDS)}")
+    parser.add_argument("--sizes", nargs="+", default=["640x480=2", "1280x960=3", "1920x1080=3", "4032x3024=2"],
+                        help="Weighted image sizes WxH[=weight]")
+    parser.add_argument("--images-per-size", type=int, default=3)
+    parser.add_argument("--threshold", type=float, default=0.4)
+    parser.add_argument("--timeout", type=float, default=60, help="Per-request timeout in seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--server-env", nargs="*", default=[], help="KEY=VALUE settings for the started API")
+    parser.add_argument("--url", default=None, help="Test a running service instead of starting one")
+    parser.add_argument("--uds-path", default=None, help="Socket of a running service (uds kind with --url)")
+    parser.add_argument("--min-gain", type=float, default=0.05, help="Throughput within this fraction of the peak counts as saturated")
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    parser.add_argument("--slo-ms", type=float, default=None, help="p95 latency objective")
+    parser.add_argument("--output", default=None, help="Write results as .json or .csv")
+    args = parser.parse_args()
+
+    mix = parse_weighted(args.mix)
+    unknown = [k for k, _ in mix if k not in KINDS]
+    if unknown:
+        parser.error(f"unknown request kinds: {', '.join(unknown)}")
+    uses_uds = any(k == "uds" for k, _ in mix)
+    if args.url and uses_uds and not args.uds_path:
+        parser.error("the uds kind needs --uds-path when testing a running service")
+    server_env = dict(item.split("=", 1) for item in args.server_env)
+
+    workdir = tempfile.mkdtemp(prefix="walle_load_")
+    print(f"Generating images in {workdir} ...")
+    images = build_images(parse_weighted(args.sizes, parse_size), args.images_per_size, args.seed, workdir)
+    build_requests(images, args.threshold)
+
+    proc = None
+    uds_path = args.uds_path
+    if args.url:
+        base_url = args.url.rstrip("/")
+    else:
+        uds_path = os.path.join(workdir, "classifier.sock") if uses_uds else None
+        print("Starting the API with a random-weight model ...")
+        proc, base_url = start_server(workdir, args.seed, server_env, uds_path)
+
+    url = urlparse(base_url)
+    target = {"host": url.hostname, "port": url.port or 80, "uds": uds_path}
+    steps = []
+    try:
+        health = get_json(f"{base_url}/health")
+        for i, concurrency in enumerate(args.concurrency):
+            if i:
+                time.sleep(args.pause)
+            print(f"  concurrency {concurrency}: {args.warmup:.0f}s warm-up + {args.duration:.0f}s ...")
+            records, elapsed = asyncio.run(run_step(
+                target, images, mix, concurrency, args.warmup, args.duration, args.seed, args.timeout,
+            ))
+            step = summarize_step(concurrency, records, elapsed)
+            step["server"] = server_state(base_url)
+            steps.append(step)
+    finally:
+        if proc:
+            proc.terminate()
+            proc.wait(timeout=30)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    saturation = find_saturation(steps, args.min_gain, args.max_error_rate, args.slo_ms)
+    print_table(steps, saturation)
+
+    if args.output:
+        if args.output.endswith(".csv"):
+            import csv
+            fields = ["concurrency", "requests", "ok", "errorRate", "throughputRps", "p50Ms", "p95Ms", "p99Ms", "meanMs"]
+            with open(args.output, "w", newline="", encoding="utf-8") as f:
+                writer = csv.DictWriter(f, fieldnames=fields, extrasaction="ignore")
+                writer.writeheader()
+                writer.writerows(steps)
+        else:
+            with open(args.output, "w", encoding="utf-8") as f:
+                json.dump({
+                    "config": {
+                        "seed": args.seed, "mix": dict(mix), "sizes": args.sizes,
+                        "imagesPerSize": args.images_per_size, "threshold": args.threshold,
+                        "warmupS": args.warmup, "durationS": args.duration, "serverEnv": server_env,
+                        "url": args.url,
+                    },
+                    "host": {"cpus": os.cpu_count(), "platform": platform.platform(), "python": platform.python_version()},
+                    "service": {k: health.get(k) for k in ("modelSource", "engine", "device", "inference", "quality")},
+                    "steps": steps,
+                    "saturation": saturation,
+                }, f, indent=2)
+        print(f"\n  [OK] Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -10,25 +10,36 @@ from torchvision.models.detection.rpn import AnchorGenerator
 from torchvision.models.detection.faster_rcnn import FastRCNNPredictor
 from torchvision.models import resnet50, ResNet50_Weights
 
+# Class list used by train.py (index 0 is background).  Subfolder names are
+# matched case-insensitively onto these waste categories.
+WASTE_CLASS_NAMES = ['__background__', 'Dry', 'E-Waste', 'Mixed', 'Wet']
 
-def get_model(num_classes, pretrained=True):
+
+def get_model(num_classes, pretrained=True, min_size=512, max_size=768):
     """
     Create Faster RCNN model with custom number of classes
     
     Args:
         num_classes (int): Number of classes (including background)
-        pretrained (bool): Use pretrained backbone
+        pretrained (bool): Start from COCO-pretrained weights.  False builds
+            the same layout (frozen BatchNorm, 3 trainable backbone stages)
+            without downloading anything, for loading a checkpoint into.
+        min_size (int): Shorter image side after the detector's resize
+        max_size (int): Cap on the longer image side
     
     Returns:
         model: Faster RCNN model
     """
     
+    if not pretrained:
+        return _mobilenet_fpn_layout(num_classes, min_size, max_size)
+
     # Load pretrained Faster RCNN with MobileNetV3-FPN backbone (optimized for low VRAM and speed)
-    weights = torchvision.models.detection.FasterRCNN_MobileNet_V3_Large_FPN_Weights.DEFAULT if pretrained else None
+    weights = torchvision.models.detection.FasterRCNN_MobileNet_V3_Large_FPN_Weights.DEFAULT
     model = torchvision.models.detection.fasterrcnn_mobilenet_v3_large_fpn(
         weights=weights, 
-        min_size=512,  # Downscale images significantly for VRAM optimization
-        max_size=768
+        min_size=min_size,  # Downscale images significantly for VRAM optimization
+        max_size=max_size
     )
     
     # Replace the classifier with a new one for our number of classes
@@ -38,6 +49,31 @@ def get_model(num_classes, pretrained=True):
     return model
 
 
+def _mobilenet_fpn_layout(num_classes, min_size, max_size):
+    """
+    Randomly initialised fasterrcnn_mobilenet_v3_large_fpn as torchvision
+    builds it from pretrained weights, so checkpoints load into it.  (With
+    weights=None torchvision would either download the ImageNet backbone or
+    switch to trainable BatchNorm, whose state dict does not match.)
+    """
+    from torchvision.models import mobilenet_v3_large
+    from torchvision.models.detection.backbone_utils import _mobilenet_extractor
+    from torchvision.ops.misc import FrozenBatchNorm2d
+
+    backbone = mobilenet_v3_large(weights=None, norm_layer=FrozenBatchNorm2d)
+    backbone = _mobilenet_extractor(backbone, True, 3)
+    anchor_sizes = ((32, 64, 128, 256, 512),) * 3
+    aspect_ratios = ((0.5, 1.0, 2.0),) * len(anchor_sizes)
+    return FasterRCNN(
+        backbone,
+        num_classes=num_classes,
+        rpn_anchor_generator=AnchorGenerator(anchor_sizes, aspect_ratios),
+        rpn_score_thresh=0.05,   # torchvision's default for this builder
+        min_size=min_size,
+        max_size=max_size,
+    )
+
+
 def get_model_custom_backbone(num_classes):
     """
     Alternative: Create Faster RCNN with custom backbone
@@ -75,17 +111,32 @@ def get_model_custom_backbone(num_classes):
     return model
 
 
-def save_model(model, optimizer, epoch, loss, path):
-    """Save model checkpoint"""
+def save_model(model, optimizer, epoch, loss, path, extra=None):
+    """
+    Save model checkpoint
+
+    `extra` is merged into the checkpoint; use it for metadata the serving
+    side needs, e.g. {'class_names': [...], 'min_size': 512, 'max_size': 768}.
+    """
     torch.save({
         'epoch': epoch,
         'model_state_dict': model.state_dict(),
         'optimizer_state_dict': optimizer.state_dict(),
         'loss': loss,
+        **(extra or {}),
     }, path)
     print(f"Model saved to {path}")
 
 
+def model_config(model, class_names):
+    """Checkpoint metadata describing a get_model() detector (see save_model)."""
+    return {
+        'class_names': list(class_names),
+        'min_size': int(model.transform.min_size[-1]),
+        'max_size': int(model.transform.max_size),
+    }
+
+
 def load_model(model, optimizer, path, device):
     """Load model checkpoint and handle device transfer"""
     # Load checkpoint to the specified device with weights_only=False because of scalars
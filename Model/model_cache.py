@@ -0,0 +1,110 @@
+"""
+Persistent prepared-model cache
+===============================
+Stores the inference-ready form of the detector (TorchScript graph, optionally
+with dynamically quantized Linear layers, plus the label table) on disk, keyed
+by everything that can change it:
+
+    sha256(checkpoint bytes | COCO weights URL)
+    + torch / torchvision versions
+    + device type
+    + preparation options (quantized or not)
+
+A restart or a fresh replica with a matching key loads the artifact with
+torch.jit.load instead of rebuilding the model, so it serves at full speed
+within seconds.  On a miss, the API serves the eager model and calls
+build_artifact() in a background thread.
+"""
+
+import os
+import json
+import hashlib
+
+import torch
+import torchvision
+
+ARTIFACT_VERSION = 1
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    """Content hash of a file, read in 1 MiB chunks."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def cache_key(source_digest, device, quantize=False):
+    """Key for a prepared artifact built from `source_digest` on `device`."""
+    parts = [
+        f"v{ARTIFACT_VERSION}",
+        source_digest,
+        f"torch={torch.__version__}",
+        f"torchvision={torchvision.__version__}",
+        f"device={torch.device(device).type}",
+        f"quantized={int(bool(quantize))}",
+    ]
+    return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()[:32]
+
+
+def artifact_path(cache_dir, key):
+    return os.path.join(cache_dir, f"{key}.pt")
+
+
+class ScriptedDetector:
+    """
+    Adapts a scripted torchvision detector to the eager call contract.
+
+    Scripted GeneralizedRCNN modules return (losses, detections) instead of
+    just the detection list.
+    """
+
+    def __init__(self, module):
+        self.module = module
+
+    def __call__(self, images):
+        _, detections = self.module(images)
+        return detections
+
+    def eval(self):
+        self.module.eval()
+        return self
+
+    def parameters(self):
+        return self.module.parameters()
+
+
+def load_artifact(cache_dir, key, device):
+    """Return (ScriptedDetector, metadata) for a cached key, or None on a miss."""
+    path = artifact_path(cache_dir, key)
+    if not os.path.exists(path):
+        return None
+    extra = {"meta.json": ""}
+    module = torch.jit.load(path, map_location=device, _extra_files=extra)
+    module.eval()
+    return ScriptedDetector(module), json.loads(extra["meta.json"])
+
+
+def build_artifact(eager_model, cache_dir, key, metadata, quantize=False):
+    """
+    Script (and optionally quantize) an eager detector and save it under `key`.
+
+    The eager model is not modified.  Returns the ScriptedDetector.
+    """
+    source = eager_model
+    if quantize:
+        # Dynamic int8 quantization of the box head's Linear layers.  CPU
+        # models only; quantize_dynamic works on a copy.
+        source = torch.ao.quantization.quantize_dynamic(
+            eager_model, {torch.nn.Linear}, dtype=torch.qint8
+        )
+    scripted = torch.jit.script(source)
+    scripted.eval()
+
+    os.makedirs(cache_dir, exist_ok=True)
+    path = artifact_path(cache_dir, key)
+    tmp  = f"{path}.{os.getpid()}.tmp"
+    torch.jit.save(scripted, tmp, _extra_files={"meta.json": json.dumps({**metadata, "key": key})})
+    os.replace(tmp, path)
+    return ScriptedDetector(scripted)
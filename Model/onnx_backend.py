@@ -0,0 +1,87 @@
+"""
+ONNX Runtime backend for the WALL.E detector
+=============================================
+Wraps an ONNX export of a torchvision Faster RCNN (see export_onnx.py) in a
+callable with the same contract as the eager model:
+
+    outputs = detector([tensor_chw, ...])
+    outputs[0]["boxes"], outputs[0]["labels"], outputs[0]["scores"]
+
+so `run_faster_rcnn` and the rest of the API pipeline stay unchanged.
+
+The exporter writes a sidecar `<model>.onnx.json` next to the graph holding
+the label table and the model source ("coco" or "custom").
+
+Requires: onnxruntime
+"""
+
+import os
+import json
+
+import torch
+
+
+def metadata_path(onnx_path):
+    """Path of the label/metadata sidecar for an exported model."""
+    return onnx_path + ".json"
+
+
+def read_metadata(onnx_path):
+    with open(metadata_path(onnx_path), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_metadata(onnx_path, metadata):
+    with open(metadata_path(onnx_path), "w", encoding="utf-8") as f:
+        json.dump(metadata, f, indent=2)
+
+
+class OnnxDetector:
+    """Callable stand-in for a torchvision detector, backed by ONNX Runtime (CPU)."""
+
+    def __init__(self, path, intra_op_threads=None):
+        import onnxruntime as ort
+
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"ONNX model not found: {path}")
+
+        opts = ort.SessionOptions()
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        opts.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        # Concurrency is handled by the API's inference governor, so each
+        # session run gets the same thread budget as an eager forward pass.
+        if intra_op_threads:
+            opts.intra_op_num_threads = intra_op_threads
+        opts.inter_op_num_threads = 1
+
+        self.path         = path
+        self.session      = ort.InferenceSession(path, sess_options=opts, providers=["CPUExecutionProvider"])
+        self.input_name   = self.session.get_inputs()[0].name
+
+        metadata          = read_metadata(path)
+        self.class_labels = metadata["classLabels"]
+        self.model_source = metadata["modelSource"]
+        # Resize limits baked into the graph (None for sidecars without them)
+        self.min_size     = tuple(metadata["minSize"]) if "minSize" in metadata else None
+        self.max_size     = metadata.get("maxSize")
+
+    def __call__(self, images):
+        """Run detection on a list of [3, H, W] float tensors in [0, 1]."""
+        outputs = []
+        # The exported graph takes one image per run.
+        for image in images:
+            array = image.detach().cpu().numpy()
+            boxes, labels, scores = self.session.run(None, {self.input_name: array})
+            outputs.append({
+                "boxes":  torch.from_numpy(boxes),
+                "labels": torch.from_numpy(labels),
+                "scores": torch.from_numpy(scores),
+            })
+        return outputs
+
+    def eval(self):
+        return self
+
+    def parameters(self):
+        # Weights live inside the ONNX graph, not as torch parameters.
+        return iter(())
@@ -0,0 +1,309 @@
+"""
+WALL.E Bulk Re-classification
+=============================
+Re-scores an archive of report images offline with the current (or a given)
+checkpoint, without going through the HTTP API.
+
+The pipeline:
+  1. List images from a directory (walked recursively, sorted) or a manifest
+     (.txt with one path per line, or .jsonl with a "path" field)
+  2. Decode images on a thread pool, a bounded window ahead of inference
+  3. Run Faster RCNN on batches of decoded images
+  4. Append one result row per image to JSONL (or Parquet part files)
+  5. Every --checkpoint-every images, fsync the output and record progress in
+     <output>.ckpt.json so a crashed run resumes where it left off
+
+Run:
+    python reclassify.py /data/reports --output rescored.jsonl
+    python reclassify.py manifest.txt --output rescored/ --format parquet \\
+        --checkpoint checkpoints/new_model.pth --batch-size 8
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+
+# ─── INPUT LISTING ──────────────────────────────────────────────────────────────
+
+def list_images(source):
+    """Return the ordered list of image paths for a directory or manifest."""
+    if os.path.isdir(source):
+        paths = []
+        for root, dirs, files in os.walk(source):
+            dirs.sort()
+            for name in sorted(files):
+                if name.lower().endswith(IMAGE_EXTENSIONS) and not name.startswith("."):
+                    paths.append(os.path.join(root, name))
+        return paths
+
+    paths = []
+    with open(source, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if source.endswith(".jsonl"):
+                paths.append(json.loads(line)["path"])
+            else:
+                paths.append(line)
+    return paths
+
+
+def fingerprint(paths):
+    """Stable hash of the input list, used to refuse resuming a different run."""
+    h = hashlib.sha1()
+    for p in paths:
+        h.update(p.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def model_identity(api):
+    """Content identity of the weights doing the scoring."""
+    if api.model_engine == "onnx":
+        from model_cache import file_sha256
+        return f"onnx:{file_sha256(api.ONNX_MODEL)}"
+    return api._source_digest(api.model_source)
+
+
+# ─── CHECKPOINTING ──────────────────────────────────────────────────────────────
+
+def read_checkpoint(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_checkpoint(path, state):
+    """Atomically replace the checkpoint file."""
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+# ─── OUTPUT WRITERS ─────────────────────────────────────────────────────────────
+
+class JsonlWriter:
+    """Appends rows to a JSONL file; commit() makes them durable."""
+
+    def __init__(self, path, resume_bytes):
+        mode = "r+b" if resume_bytes and os.path.exists(path) else "wb"
+        self._f = open(path, mode)
+        if mode == "r+b":
+            # Drop anything written after the last checkpoint (partial lines).
+            self._f.truncate(resume_bytes)
+            self._f.seek(resume_bytes)
+
+    def write(self, row):
+        self._f.write((json.dumps(row, ensure_ascii=False) + "\n").encode("utf-8"))
+
+    def commit(self):
+        self._f.flush()
+        os.fsync(self._f.fileno())
+        return {"outputBytes": self._f.tell()}
+
+    def close(self):
+        self._f.close()
+
+
+class ParquetWriter:
+    """Buffers rows and writes one Parquet part file per commit()."""
+
+    def __init__(self, directory, resume_parts):
+        import pandas as pd   # pyarrow (or fastparquet) must also be installed
+        self._pd = pd
+        self._dir = directory
+        self._rows = []
+        self._parts = resume_parts or 0
+        os.makedirs(directory, exist_ok=True)
+        # Remove part files written after the last checkpoint.
+        for name in os.listdir(directory):
+            if name.startswith("part-") and name.endswith(".parquet"):
+                if int(name[5:-8]) >= self._parts:
+                    os.remove(os.path.join(directory, name))
+
+    def write(self, row):
+        flat = dict(row)
+        for key in ("categoryVotes", "detections"):
+            if key in flat:
+                flat[key] = json.dumps(flat[key])
+        self._rows.append(flat)
+
+    def commit(self):
+        if self._rows:
+            path = os.path.join(self._dir, f"part-{self._parts:06d}.parquet")
+            self._pd.DataFrame(self._rows).to_parquet(path + ".tmp", index=False)
+            os.replace(path + ".tmp", path)
+            self._parts += 1
+            self._rows = []
+        return {"parts": self._parts}
+
+    def close(self):
+        pass
+
+
+# ─── DECODING ───────────────────────────────────────────────────────────────────
+
+def decode(path):
+    """Decode one image as /classify would; errors are returned rather than raised."""
+    import waste_classifier_api as api
+    try:
+        return api.decode_image(path), None
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}"
+
+
+def iter_decoded(paths, start, executor, window):
+    """Yield (index, path, image, error) in order, decoding `window` ahead."""
+    pending = deque()
+    next_idx = start
+    while next_idx < len(paths) or pending:
+        while next_idx < len(paths) and len(pending) < window:
+            pending.append((next_idx, executor.submit(decode, paths[next_idx])))
+            next_idx += 1
+        idx, fut = pending.popleft()
+        img, err = fut.result()
+        yield idx, paths[idx], img, err
+
+
+# ─── MAIN LOOP ──────────────────────────────────────────────────────────────────
+
+def reclassify(args):
+    if args.checkpoint:
+        os.environ["MODEL_CHECKPOINT"] = os.path.abspath(args.checkpoint)
+    # One caller thread → give the forward pass every core.
+    os.environ.setdefault("INFERENCE_MAX_CONCURRENCY", "1")
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import waste_classifier_api as api
+
+    paths = list_images(args.input)
+    fp = fingerprint(paths)
+    model_id = model_identity(api)
+    print(f"\n  Found {len(paths)} images in {args.input}")
+
+    ckpt_path = args.output.rstrip("/\\") + ".ckpt.json"
+    state = None if args.restart else read_checkpoint(ckpt_path)
+    if state:
+        # Appending to an output scored under different settings would mix
+        # two models' (or thresholds') results in one file.
+        for key, current, what in (
+            ("fingerprint", fp, "input list"),
+            ("model", model_id, "model weights"),
+            ("threshold", args.threshold, "--threshold"),
+        ):
+            if state.get(key) != current:
+                print(f"ERROR: {what} changed since the last checkpoint. "
+                      "Re-run with --restart to start over.")
+                return False
+
+    start = state["nextIndex"] if state else 0
+    if start:
+        print(f"  Resuming from image {start} ({ckpt_path})")
+
+    if args.format == "parquet":
+        writer = ParquetWriter(args.output, state.get("parts") if state else 0)
+    else:
+        writer = JsonlWriter(args.output, state.get("outputBytes") if state else 0)
+
+    def flush(next_index):
+        progress = writer.commit()
+        write_checkpoint(ckpt_path, {
+            "fingerprint": fp,
+            "model":       model_id,
+            "threshold":   args.threshold,
+            "total":       len(paths),
+            "nextIndex":   next_index,
+            "modelSource": api.model_source,
+            **progress,
+        })
+
+    def emit(batch):
+        imgs = [item[2] for item in batch]
+        results = api.run_faster_rcnn_batch(imgs, conf_threshold=args.threshold)
+        for (_, path, _, _), detections in zip(batch, results):
+            summary = api.summarize_detections(detections, args.threshold)
+            row = {
+                "path":            path,
+                "wasteType":       summary["wasteType"],
+                "confidence":      summary["confidence"],
+                "categoryVotes":   summary["categoryVotes"],
+                "totalDetections": summary["totalDetections"],
+                "modelSource":     summary["modelSource"],
+            }
+            if args.detections:
+                row["detections"] = detections
+            writer.write(row)
+
+    workers = args.workers or max(2, (os.cpu_count() or 2) // 2)
+    t0 = time.perf_counter()
+    done = 0
+    since_flush = 0
+    batch = []
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for idx, path, img, err in iter_decoded(paths, start, executor, args.batch_size * 4):
+            if err is not None:
+                writer.write({"path": path, "error": err})
+            else:
+                batch.append((idx, path, img, err))
+                if len(batch) >= args.batch_size:
+                    emit(batch)
+                    batch = []
+
+            done += 1
+            since_flush += 1
+            # Only checkpoint on batch boundaries so nextIndex never skips
+            # images that are still waiting in `batch`.
+            if since_flush >= args.checkpoint_every and not batch:
+                flush(idx + 1)
+                since_flush = 0
+                rate = done / (time.perf_counter() - t0)
+                print(f"  {idx + 1}/{len(paths)} images  ({rate:.1f} img/s)")
+
+        if batch:
+            emit(batch)
+        flush(len(paths))
+
+    writer.close()
+    elapsed = time.perf_counter() - t0
+    print(f"\n  [OK] Re-classified {done} images in {elapsed:.1f}s -> {args.output}")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk offline re-classification of report images")
+    parser.add_argument("input", help="Image directory or manifest (.txt / .jsonl)")
+    parser.add_argument("--output", required=True, help="Output .jsonl file or Parquet directory")
+    parser.add_argument("--format", choices=["jsonl", "parquet"], default=None,
+                        help="Output format (default: from --output extension)")
+    parser.add_argument("--checkpoint", default=None, help="Model checkpoint to score with")
+    parser.add_argument("--threshold", type=float, default=0.4, help="Detection confidence cutoff")
+    parser.add_argument("--batch-size", type=int, default=4, help="Images per forward pass")
+    parser.add_argument("--workers", type=int, default=0, help="Decode threads (default: cores / 2)")
+    parser.add_argument("--checkpoint-every", type=int, default=1000,
+                        help="Images between durable progress checkpoints")
+    parser.add_argument("--detections", action="store_true", help="Include full detection lists")
+    parser.add_argument("--restart", action="store_true", help="Ignore any existing checkpoint")
+    args = parser.parse_args()
+
+    if args.format is None:
+        args.format = "jsonl" if args.output.endswith(".jsonl") else "parquet"
+
+    sys.exit(0 if reclassify(args) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+ONNX export parity: a seeded random-weight get_model() detector (the one
+load_test.py serves) exported with export_onnx.export() must give the same
+detections under ONNX Runtime, including on image sizes other than the
+export sample.
+
+Run:
+    python -m pytest -q test_export_onnx.py
+"""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("onnx")
+pytest.importorskip("onnxruntime")
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from export_onnx import export, verify                # noqa: E402
+from load_test import make_image, make_random_model   # noqa: E402
+from model import WASTE_CLASS_NAMES                   # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def detector():
+    # Reduced input size keeps the export and both forward passes quick.
+    return make_random_model(0, min_size=320, max_size=512)
+
+
+@pytest.fixture(scope="module")
+def images(tmp_path_factory):
+    folder = tmp_path_factory.mktemp("images")
+    rng = np.random.default_rng(0)
+    paths = []
+    for i, (w, h) in enumerate([(640, 480), (480, 640), (800, 600)]):
+        path = folder / f"synthetic_{i}.jpg"
+        path.write_bytes(make_image(rng, w, h))
+        paths.append(str(path))
+    return paths
+
+
+def test_onnx_matches_torch(detector, images, tmp_path):
+    output = str(tmp_path / "model.onnx")
+    export(detector, output, opset=17, class_labels=WASTE_CLASS_NAMES, model_source="custom")
+
+    assert os.path.exists(output + ".json")
+    # Random weights score every class near 1/5; compare the full top-100
+    assert verify(detector, output, images, min_score=0.0, score_tol=1e-3, iou_min=0.95)
@@ -1,6 +1,9 @@
 import os
 import sys
 import glob
+import json
+import math
+import time
 import torch
 import torchvision
 from PIL import Image
@@ -9,36 +12,42 @@ from torch.utils.data import Dataset, DataLoader
 
 # Add current directory to path for imports
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
-from model import get_model, save_model, load_model
+from model import get_model, save_model, load_model, model_config, WASTE_CLASS_NAMES
+from dataset_manifest import update_manifest, manifest_entries, label_for_folder, FALLBACK_LABEL
 
 class CustomWetWasteDataset(Dataset):
-    def __init__(self, folder_path):
+    def __init__(self, folder_path, manifest_path=None, use_manifest=True, write_manifest=True):
         self.folder_path = folder_path
         self.image_data = [] # List of tuples: (image_path, label_id)
         self.transform = T.Compose([T.ToTensor()])
         
+        if use_manifest and os.path.isdir(folder_path):
+            self._load_from_manifest(manifest_path, write_manifest)
+        else:
+            self._load_from_glob()
+
+    def _load_from_manifest(self, manifest_path, write_manifest):
+        # Incremental listing: only changed class folders are rescanned
+        manifest = update_manifest(self.folder_path, manifest_path, write=write_manifest)
+        self.manifest = manifest
+        for img_path, label_id, _, _ in manifest_entries(manifest):
+            self.image_data.append((img_path, label_id))
+        for rel, d in sorted(manifest["dirs"].items()):
+            if rel == ".":
+                print(f"No valid class subfolders found. Treating all {len(d['files'])} images as Wet waste (Class ID {FALLBACK_LABEL}).")
+            else:
+                print(f"Subfolder '{rel}' -> Mapped to class ID {d['label']}. Found {len(d['files'])} images.")
+
+    def _load_from_glob(self):
+        folder_path = self.folder_path
         # Check for subdirectories first
         subfolders = []
         if os.path.exists(folder_path) and os.path.isdir(folder_path):
             subfolders = [d for d in os.listdir(folder_path) if os.path.isdir(os.path.join(folder_path, d))]
         
-        # Mapping definition based on sorted: ['Dry', 'E-Waste', 'Mixed', 'Wet']
-        # 1-indexed: Dry=1, E-Waste=2, Mixed=3, Wet=4
-        label_mapping = {
-            'dry': 1,
-            'e-waste': 2,
-            'mixed': 3,
-            'wet': 4
-        }
-        
         has_subdirs = False
         for sub in subfolders:
-            sub_lower = sub.lower()
-            target_label = None
-            for key, val in label_mapping.items():
-                if key in sub_lower:
-                    target_label = val
-                    break
+            target_label = label_for_folder(sub)
             
             if target_label is not None:
                 has_subdirs = True
@@ -60,8 +69,8 @@ class CustomWetWasteDataset(Dataset):
                 image_paths.extend(glob.glob(os.path.join(folder_path, ext)))
             image_paths = sorted(list(set(image_paths)))
             for img_path in image_paths:
-                self.image_data.append((img_path, 4))
-            print(f"No valid class subfolders found. Treating all {len(image_paths)} images as Wet waste (Class ID 4).")
+                self.image_data.append((img_path, FALLBACK_LABEL))
+            print(f"No valid class subfolders found. Treating all {len(image_paths)} images as Wet waste (Class ID {FALLBACK_LABEL}).")
 
     def __len__(self):
         return len(self.image_data)
@@ -90,27 +99,174 @@ class CustomWetWasteDataset(Dataset):
 def collate_fn(batch):
     return tuple(zip(*batch))
 
-def train_model(data_folder, epochs=15, lr=0.005):
-    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-    print(f"Training on device: {device}")
+def peak_memory_mb(device):
+    """Peak memory of this process so far: CUDA allocator on GPU, max RSS on CPU."""
+    if device.type == 'cuda':
+        return torch.cuda.max_memory_allocated(device) / (1024 * 1024)
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    return rss / (1024 * 1024) if sys.platform == 'darwin' else rss / 1024
+
+class TrainingLog:
+    """
+    Per-step timing for the training loop, written as JSON lines.
+
+    Each step is split into data wait, host-to-device transfer, forward,
+    backward and optimizer step.  end_epoch() prints a one-line summary and
+    appends an "epoch" record with phase totals, samples/s and peak memory.
+    A diverged (NaN/inf) loss is written as null so the file stays valid JSON.
+    """
+    PHASES = ('dataWait', 'h2d', 'forward', 'backward', 'optimizer')
+
+    def __init__(self, path, device, world_size=1, verbose=True):
+        self.device = device
+        self.world_size = world_size
+        self.verbose = verbose
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._f = open(path, 'a', encoding='utf-8')
+        self._write({'event': 'start', 'time': time.time(), 'device': str(device),
+                     'threads': torch.get_num_threads(), 'worldSize': world_size})
+        self._reset()
+
+    def _reset(self):
+        self.totals = dict.fromkeys(self.PHASES, 0.0)
+        self.samples = 0
+        self.steps = 0
+        self.started = time.perf_counter()
+        if self.device.type == 'cuda':
+            torch.cuda.reset_peak_memory_stats(self.device)
+
+    def _write(self, record):
+        self._f.write(json.dumps(record) + '\n')
+
+    @staticmethod
+    def _loss(loss):
+        return round(loss, 5) if math.isfinite(loss) else None
+
+    def sync(self):
+        """Wait for queued GPU work so phase boundaries are measured correctly."""
+        if self.device.type == 'cuda':
+            torch.cuda.synchronize(self.device)
+
+    def step(self, epoch, step, batch_size, loss, timings):
+        for phase in self.PHASES:
+            self.totals[phase] += timings[phase]
+        self.samples += batch_size
+        self.steps += 1
+        self._write({'event': 'step', 'epoch': epoch, 'step': step, 'batch': batch_size,
+                     'loss': self._loss(loss),
+                     **{f'{p}Ms': round(timings[p] * 1000, 2) for p in self.PHASES}})
+
+    def end_epoch(self, epoch, epochs, loss):
+        elapsed = time.perf_counter() - self.started
+        busy = sum(self.totals.values()) or 1.0
+        peak = peak_memory_mb(self.device)
+        summary = {
+            'event': 'epoch', 'epoch': epoch, 'loss': self._loss(loss), 'steps': self.steps,
+            'samples': self.samples, 'seconds': round(elapsed, 3),
+            # Shards are equal-sized, so global throughput is local x world size
+            'samplesPerSec': round(self.samples * self.world_size / elapsed, 3) if elapsed > 0 else None,
+            'peakMemoryMB': round(peak, 1) if peak is not None else None,
+            **{f'{p}S': round(self.totals[p], 3) for p in self.PHASES},
+        }
+        self._write(summary)
+        self._f.flush()
+        if not self.verbose:
+            self._reset()
+            return
+
+        shares = ' '.join(f"{p} {100 * self.totals[p] / busy:.0f}%" for p in self.PHASES)
+        mem = f" | peak {peak:.0f} MB" if peak is not None else ""
+        print(f"Epoch {epoch}/{epochs} - Loss: {loss:.4f} | {summary['samplesPerSec']} samples/s | {shares}{mem}")
+        self._reset()
+
+    def close(self):
+        self._f.close()
+
+def _free_port():
+    import socket
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def _ddp_worker(rank, world_size, port, data_folder, epochs, lr, log_path):
+    """Entry point of one data-parallel training process (gloo, CPU)."""
+    import torch.distributed as dist
+
+    os.environ["MASTER_ADDR"] = "127.0.0.1"
+    os.environ["MASTER_PORT"] = str(port)
+    dist.init_process_group("gloo", rank=rank, world_size=world_size)
+    # Split the cores between processes instead of every rank using all of them
+    torch.set_num_threads(max(1, (os.cpu_count() or 1) // world_size))
+    try:
+        _train(data_folder, epochs, lr, log_path, rank=rank, world_size=world_size)
+    finally:
+        dist.destroy_process_group()
+
+def train_model(data_folder, epochs=15, lr=0.005, log_path=None, nprocs=1):
+    """
+    Fine-tune the WALL.E detector on `data_folder`.
+
+    With nprocs > 1 the same entry point launches that many local processes
+    that train with DistributedDataParallel over the gloo backend (CPU): the
+    dataset is sharded across ranks, gradients are all-reduced every step and
+    only rank 0 writes the checkpoint.
+    """
+    if nprocs <= 1:
+        return _train(data_folder, epochs, lr, log_path)
+
+    import torch.multiprocessing as mp
+    # Refresh the manifest once here so the ranks only read it
+    if os.path.isdir(data_folder):
+        update_manifest(data_folder)
+    print(f"Launching {nprocs} data-parallel training processes (gloo)")
+    mp.spawn(
+        _ddp_worker,
+        args=(nprocs, _free_port(), data_folder, epochs, lr, log_path),
+        nprocs=nprocs,
+        join=True,
+    )
+    return True
+
+def _train(data_folder, epochs, lr, log_path, rank=0, world_size=1):
+    distributed = world_size > 1
+    is_main = rank == 0
+    if distributed:
+        import torch.distributed as dist
+        from torch.nn.parallel import DistributedDataParallel
+        from torch.utils.data.distributed import DistributedSampler
+
+    device = torch.device("cuda" if torch.cuda.is_available() and not distributed else "cpu")
+    if is_main:
+        print(f"Training on device: {device}" + (f" x {world_size} processes" if distributed else ""))
     
     # 1. Initialize dataset and dataloader
-    dataset = CustomWetWasteDataset(data_folder)
+    # DDP ranks only read the manifest the parent refreshed before spawning
+    dataset = CustomWetWasteDataset(data_folder, write_manifest=not distributed)
     if len(dataset) == 0:
         print("ERROR: No images found to train on.")
         return False
         
+    sampler = DistributedSampler(dataset, num_replicas=world_size, rank=rank, shuffle=True) if distributed else None
     data_loader = DataLoader(
         dataset, 
         batch_size=2, 
-        shuffle=True, 
+        shuffle=sampler is None, 
+        sampler=sampler,
         num_workers=0, 
         collate_fn=collate_fn
     )
     
     # 2. Load or initialize Faster R-CNN model
+    # (rank 0 goes first so pretrained weights are downloaded only once)
+    if distributed and not is_main:
+        dist.barrier()
     checkpoint_path = os.path.join(os.path.dirname(__file__), "checkpoints", "best_model.pth")
-    num_classes = 5  # Background + 4 classes
+    num_classes = len(WASTE_CLASS_NAMES)  # Background + 4 classes
     model = get_model(num_classes=num_classes, pretrained=False)
     
     if os.path.exists(checkpoint_path):
@@ -124,46 +280,100 @@ def train_model(data_folder, epochs=15, lr=0.005):
     else:
         print("No existing checkpoint found. Initializing model with pre-trained MobileNetV3-FPN backbone.")
         model = get_model(num_classes=num_classes, pretrained=True)
+    if distributed and is_main:
+        dist.barrier()
         
     model.to(device)
+    # DDP broadcasts rank 0's weights on construction, so every rank starts equal
+    net = DistributedDataParallel(model) if distributed else model
     
     # 3. Setup optimizer
     params = [p for p in model.parameters() if p.requires_grad]
     optimizer = torch.optim.SGD(params, lr=lr, momentum=0.9, weight_decay=0.0005)
     
-    # 4. Training Loop
-    model.train()
-    print("\nStarting training loop...")
+    # 4. Training Loop (per-step timings go to the structured log)
+    if log_path is None:
+        log_path = os.path.join(os.path.dirname(checkpoint_path), "train_log.jsonl")
+    if not is_main:
+        root, ext = os.path.splitext(log_path)
+        log_path = f"{root}.rank{rank}{ext}"
+    log = TrainingLog(log_path, device, world_size=world_size, verbose=is_main)
+    if is_main:
+        print(f"Writing step timings to {log_path}")
+
+    net.train()
+    if is_main:
+        print("\nStarting training loop...")
     for epoch in range(1, epochs + 1):
+        if sampler is not None:
+            sampler.set_epoch(epoch)
         epoch_loss = 0.0
-        for images, targets in data_loader:
+        t_ready = time.perf_counter()
+        for step, (images, targets) in enumerate(data_loader, 1):
+            t_batch = time.perf_counter()
+
             # Move data to device
             images = list(image.to(device) for image in images)
             targets = [{k: v.to(device) for k, v in t.items()} for t in targets]
+            log.sync()
+            t_h2d = time.perf_counter()
             
             # Forward pass: Faster R-CNN returns dictionary of losses in training mode
-            loss_dict = model(images, targets)
+            loss_dict = net(images, targets)
             losses = sum(loss for loss in loss_dict.values())
+            log.sync()
+            t_fwd = time.perf_counter()
             
-            # Backward pass & optimization
+            # Backward pass & optimization (DDP all-reduces gradients here)
             optimizer.zero_grad()
             losses.backward()
+            log.sync()
+            t_bwd = time.perf_counter()
             optimizer.step()
+            log.sync()
+            t_opt = time.perf_counter()
             
-            epoch_loss += losses.item()
+            step_loss = losses.item()
+            epoch_loss += step_loss
+            log.step(epoch, step, len(images), step_loss, {
+                'dataWait':  t_batch - t_ready,
+                'h2d':       t_h2d - t_batch,
+                'forward':   t_fwd - t_h2d,
+                'backward':  t_bwd - t_fwd,
+                'optimizer': t_opt - t_bwd,
+            })
+            t_ready = time.perf_counter()
             
-        print(f"Epoch {epoch}/{epochs} - Loss: {epoch_loss/len(data_loader):.4f}")
+        mean_loss = epoch_loss / len(data_loader)
+        if distributed:
+            # Average the epoch loss over ranks for reporting
+            loss_t = torch.tensor([mean_loss])
+            dist.all_reduce(loss_t)
+            mean_loss = loss_t.item() / world_size
+        log.end_epoch(epoch, epochs, mean_loss)
         
-    # 5. Save updated model
-    os.makedirs(os.path.dirname(checkpoint_path), exist_ok=True)
-    save_model(model, optimizer, epoch, epoch_loss/len(data_loader), checkpoint_path)
-    print("Fine-tuning completed successfully!")
+    log.close()
+
+    # 5. Save updated model (rank 0 only)
+    if is_main:
+        os.makedirs(os.path.dirname(checkpoint_path), exist_ok=True)
+        save_model(model, optimizer, epoch, mean_loss, checkpoint_path,
+                   extra=model_config(model, WASTE_CLASS_NAMES))
+        print("Fine-tuning completed successfully!")
+    if distributed:
+        dist.barrier()
     return True
 
 if __name__ == "__main__":
-    if len(sys.argv) > 1:
-        data_folder = sys.argv[1]
-    else:
-        data_folder = r"D:\New folder"
-        
-    train_model(data_folder)
+    import argparse
+    parser = argparse.ArgumentParser(description="Fine-tune the WALL.E Faster RCNN detector")
+    parser.add_argument("data_folder", nargs="?", default=r"D:\New folder")
+    parser.add_argument("--epochs", type=int, default=15)
+    parser.add_argument("--lr", type=float, default=0.005)
+    parser.add_argument("--log", default=None, help="Step-timing log (default: checkpoints/train_log.jsonl)")
+    parser.add_argument("--nprocs", type=int, default=1,
+                        help="Local data-parallel processes (gloo); 0 = one per 4 cores")
+    args = parser.parse_args()
+
+    nprocs = args.nprocs if args.nprocs > 0 else max(1, (os.cpu_count() or 1) // 4)
+    train_model(args.data_folder, epochs=args.epochs, lr=args.lr, log_path=args.log, nprocs=nprocs)
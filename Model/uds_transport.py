@@ -0,0 +1,198 @@
+"""
+Local binary transport
+======================
+A Unix domain socket listener for a backend running on the same host as the
+Model service.  It skips HTTP and multipart parsing: the client writes a
+fixed 16-byte header followed by the encoded image bytes, and gets back a
+12-byte header followed by a compact JSON result.  Connections are
+persistent; a client may send any number of requests on one connection,
+one at a time.
+
+Request  (network byte order):
+    magic    4s   b"WALE"
+    version  B    1
+    quality  B    0 = auto, 1 = full, 2 = balanced, 3 = fast
+    flags    H    bit 0: include the detection list in the result
+    threshold f   detection confidence cutoff (float32)
+    length   I    number of image bytes that follow
+
+Response:
+    magic    4s   b"WALE"
+    version  B    1
+    (pad)    x
+    status   H    HTTP-equivalent status: 200, 400, 413, 503 or 500
+    length   I    number of UTF-8 JSON bytes that follow
+
+The server side only moves bytes; the API passes in the function that does
+the actual work (waste_classifier_api.classify_raw), so both transports
+share the same decode and classify_image pipeline.
+"""
+
+import os
+import json
+import socket
+import struct
+import threading
+import socketserver
+
+MAGIC   = b"WALE"
+VERSION = 1
+
+REQUEST_HEADER  = struct.Struct("!4sBBHfI")
+RESPONSE_HEADER = struct.Struct("!4sBxHI")
+
+QUALITY_CODES    = (None, "full", "balanced", "fast")
+FLAG_DETECTIONS  = 0x1
+
+
+class ProtocolError(Exception):
+    pass
+
+
+def _recv_exact(sock, n):
+    """Read exactly n bytes; None on a clean EOF before the first byte."""
+    buf  = bytearray(n)
+    view = memoryview(buf)
+    got  = 0
+    while got < n:
+        k = sock.recv_into(view[got:], n - got)
+        if k == 0:
+            if got == 0:
+                return None
+            raise ProtocolError(f"connection closed after {got} of {n} bytes")
+        got += k
+    return buf
+
+
+def _send_response(sock, status, body):
+    data = json.dumps(body, separators=(",", ":")).encode("utf-8")
+    sock.sendall(RESPONSE_HEADER.pack(MAGIC, VERSION, status, len(data)) + data)
+
+
+# ─── SERVER ─────────────────────────────────────────────────────────────────────
+
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        try:
+            self._serve_connection()
+        except (ProtocolError, ConnectionError):
+            pass   # client went away mid-request
+
+    def _serve_connection(self):
+        server = self.server
+        sock   = self.request
+        while True:
+            header = _recv_exact(sock, REQUEST_HEADER.size)
+            if header is None:
+                return
+            magic, version, quality_code, flags, threshold, length = REQUEST_HEADER.unpack(header)
+            if magic != MAGIC or version != VERSION:
+                _send_response(sock, 400, {"error": "invalid_request",
+                                           "message": f"bad magic/version {magic!r}/{version}"})
+                return
+            if length > server.max_payload:
+                # The payload is not read, so the stream cannot be resynchronised
+                _send_response(sock, 413, {"error": "image_too_large",
+                                           "message": f"{length} bytes exceeds {server.max_payload}"})
+                return
+            if quality_code >= len(QUALITY_CODES):
+                _send_response(sock, 400, {"error": "invalid_request",
+                                           "message": f"unknown quality code {quality_code}"})
+                return
+
+            raw = _recv_exact(sock, length) if length else bytearray()
+            if raw is None:
+                return
+            # float32 on the wire: 0.4 arrives as 0.4000000059604645
+            status, body = server.classify(
+                raw, round(threshold, 6), QUALITY_CODES[quality_code], bool(flags & FLAG_DETECTIONS)
+            )
+            _send_response(sock, status, body)
+
+
+class UdsServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path, classify, max_payload):
+        self.classify    = classify
+        self.max_payload = max_payload
+        super().__init__(path, _Handler)
+
+
+def serve(path, classify, max_payload, mode=0o660):
+    """
+    Listen on `path` in a daemon thread and return the server.
+
+    `classify(raw_bytes, threshold, quality_or_None, include_detections)`
+    must return (status, json_dict).  A stale socket file is removed first.
+    """
+    if os.path.exists(path):
+        os.unlink(path)
+    server = UdsServer(path, classify, max_payload)
+    os.chmod(path, mode)
+    threading.Thread(target=server.serve_forever, name="uds-listener", daemon=True).start()
+    return server
+
+
+# ─── CLIENT ─────────────────────────────────────────────────────────────────────
+
+class UdsClient:
+    """Blocking client holding one persistent connection (not thread-safe)."""
+
+    def __init__(self, path, timeout=30.0):
+        self.path    = path
+        self.timeout = timeout
+        self._sock   = None
+
+    def _connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.path)
+        self._sock = sock
+
+    def classify(self, image_bytes, threshold=0.4, quality=None, detections=False):
+        """Send encoded image bytes; returns (status, result dict)."""
+        header = REQUEST_HEADER.pack(
+            MAGIC, VERSION, QUALITY_CODES.index(quality),
+            FLAG_DETECTIONS if detections else 0, threshold, len(image_bytes),
+        )
+        for attempt in (0, 1):
+            reused = self._sock is not None
+            if not reused:
+                self._connect()
+            sent = False
+            try:
+                self._sock.sendall(header)
+                self._sock.sendall(image_bytes)
+                sent = True
+                resp = _recv_exact(self._sock, RESPONSE_HEADER.size)
+                if resp is None:
+                    raise ProtocolError("connection closed by server")
+                break
+            except (OSError, ProtocolError):
+                # A kept-alive connection may have been closed by the server
+                # before it read anything; retry that once on a fresh one.
+                # Once the whole request is written the server may already be
+                # classifying it, so a timeout or EOF then is not retried.
+                self.close()
+                if attempt or sent or not reused:
+                    raise
+        magic, version, status, length = RESPONSE_HEADER.unpack(resp)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ProtocolError(f"bad response magic/version {magic!r}/{version}")
+        body = _recv_exact(self._sock, length) if length else b"{}"
+        if body is None:
+            self.close()
+            raise ProtocolError("connection closed before the response body")
+        if status != 200:
+            # The server may close the connection after an error; reconnect lazily
+            self.close()
+        return status, json.loads(bytes(body).decode("utf-8"))
+
+    def close(self):
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            finally:
+                self._sock = None
@@ -213,6 +213,11 @@ def map_custom_label_to_waste_category(label: str) -> str:
     Returns:
         Waste category string: 'Wet' | 'Dry' | 'E-Waste' | 'Mixed'
     """
+    # Models trained by train.py predict the waste categories directly
+    for cat in CATEGORY_INFO:
+        if label.lower() == cat.lower():
+            return cat
+
     # Exact match first
     if label in CUSTOM_DATASET_CATEGORY_MAP:
         return CUSTOM_DATASET_CATEGORY_MAP[label]
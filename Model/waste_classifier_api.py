@@ -12,6 +12,7 @@ The pipeline:
 
 Model priority:
   ① If checkpoints/best_model.pth EXISTS  → use the custom-trained WALL.E model
+     (or a distilled student, see distill.py; MODEL_CHECKPOINT overrides the path)
   ② Otherwise                            → use COCO-pretrained Faster RCNN
      (works immediately, no training needed, 80-class COCO → 4 waste categories)
 
@@ -24,14 +25,24 @@ Endpoints:
     GET  /categories          - Category metadata
     POST /classify            - Classify image (file, base64, or path)
     POST /classify/path       - Classify by absolute file path (backend use)
+    POST /admin/profile       - Capture torch.profiler traces for the next N requests
+
+    With UDS_PATH set, the same pipeline is also served over a Unix domain
+    socket with a length-prefixed binary protocol (see uds_transport.py).
 """
 
 import os
 import sys
 import json
 import io
+import copy
 import base64
+import hmac
+import time
+import threading
 import traceback
+from collections import deque
+from contextlib import contextmanager
 from pathlib import Path
 
 import torch
@@ -42,9 +53,13 @@ import numpy as np
 
 from flask import Flask, request, jsonify
 from flask_cors import CORS
+from werkzeug.exceptions import RequestEntityTooLarge
 
 # Add Model directory to path for imports
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from image_io import (
+    ImageTooLargeError, open_drafted, finish_decode, DEFAULT_MIN_SIZE, DEFAULT_MAX_SIZE,
+)
 from waste_category_mapper import (
     map_coco_label_to_waste_category,
     map_custom_label_to_waste_category,
@@ -66,6 +81,173 @@ print(f"  Device : {device}")
 if torch.cuda.is_available():
     print(f"  GPU    : {torch.cuda.get_device_name(0)}")
 
+# ─── INFERENCE GOVERNOR ─────────────────────────────────────────────────────────
+# Flask runs with threaded=True, so every request thread would otherwise start
+# its own forward pass on top of PyTorch's full intra-op thread pool.  The
+# governor caps concurrent passes and splits the cores between them.
+#
+# Environment overrides:
+#   INFERENCE_MAX_CONCURRENCY   upper bound on concurrent forward passes
+#   INFERENCE_INTRA_OP_THREADS  torch.set_num_threads() value
+#   INFERENCE_INTER_OP_THREADS  torch.set_num_interop_threads() value
+#   INFERENCE_TARGET_LATENCY_MS per-pass latency the governor steers towards
+#                               (default: 2x the best single-pass latency seen)
+
+
+def _env_int(name, default):
+    value = os.environ.get(name)
+    return int(value) if value not in (None, "") else default
+
+
+def _available_cores():
+    """Cores this process may run on (respects container CPU affinity)."""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0)) or 1
+    return os.cpu_count() or 1
+
+
+class InferenceGovernor:
+    """
+    Admits at most `limit` concurrent forward passes.
+
+    The limit moves between 1 and `max_limit` from observed per-pass latency:
+    when the smoothed latency drifts above the target the limit is cut by a
+    quarter, and when it sits comfortably below while requests are queueing
+    the limit grows by one.  Extra requests wait in line instead of fighting
+    over the same cores, so throughput stays flat as load rises.
+
+    Quality profiles differ several-fold in cost, so each keeps its own
+    uncontended baseline and every pass is measured against the target of
+    the profile it ran; the smoothed value that drives the limit is that
+    ratio ("pressure"), not raw milliseconds.
+    """
+
+    def __init__(self, max_limit, target_latency_ms=None, window=16,
+                 tolerance=2.0):
+        self.max_limit         = max(1, max_limit)
+        self.limit             = self.max_limit
+        self.target_latency_ms = target_latency_ms
+        self.window            = window
+        self.tolerance         = tolerance
+
+        self._cond        = threading.Condition()
+        self._active      = 0
+        self._waiting     = 0
+        self._completed   = 0
+        self._since_tune  = 0
+        self._ewma_ms     = None
+        self._pressure    = None
+        self._baseline_ms = {}   # profile → best uncontended latency
+
+    @contextmanager
+    def slot(self, profile="full"):
+        """Hold one forward-pass slot for the duration of the block."""
+        with self._cond:
+            self._waiting += 1
+            while self._active >= self.limit:
+                self._cond.wait()
+            self._waiting -= 1
+            self._active  += 1
+            solo = self._active == 1
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000.0
+            with self._cond:
+                self._active -= 1
+                self._record(profile, elapsed_ms, solo)
+                self._cond.notify_all()
+
+    def _target_ms(self, profile):
+        if self.target_latency_ms:
+            return self.target_latency_ms
+        baseline = self._baseline_ms.get(profile)
+        if baseline is None:
+            return None
+        return baseline * self.tolerance
+
+    def _record(self, profile, elapsed_ms, solo):
+        """Update latency statistics and retune the limit (lock held)."""
+        self._completed  += 1
+        self._since_tune += 1
+        self._ewma_ms = (
+            elapsed_ms if self._ewma_ms is None
+            else 0.8 * self._ewma_ms + 0.2 * elapsed_ms
+        )
+        baseline = self._baseline_ms.get(profile)
+        if baseline is None:
+            # Provisional until an uncontended pass of this profile lowers it.
+            self._baseline_ms[profile] = elapsed_ms
+        elif solo:
+            # Best uncontended latency, allowed to creep up slowly so a single
+            # lucky sample does not pin the target forever.
+            self._baseline_ms[profile] = min(elapsed_ms, baseline * 1.01)
+
+        ratio = elapsed_ms / self._target_ms(profile)
+        self._pressure = (
+            ratio if self._pressure is None
+            else 0.8 * self._pressure + 0.2 * ratio
+        )
+
+        if self._since_tune < self.window:
+            return
+        self._since_tune = 0
+
+        if self._pressure > 1.0 and self.limit > 1:
+            self.limit = max(1, int(self.limit * 0.75))
+        elif (self._pressure < 0.8 and self._waiting > 0
+              and self.limit < self.max_limit):
+            self.limit += 1
+
+    @property
+    def waiting(self):
+        """Requests currently queued for a slot."""
+        return self._waiting
+
+    def state(self):
+        """Snapshot for /health."""
+        with self._cond:
+            profiles = {}
+            for name, baseline in self._baseline_ms.items():
+                profiles[name] = {
+                    "baselineMs": round(baseline, 1),
+                    "targetMs":   round(self._target_ms(name), 1),
+                }
+            return {
+                "limit":           self.limit,
+                "maxLimit":        self.max_limit,
+                "active":          self._active,
+                "waiting":         self._waiting,
+                "completed":       self._completed,
+                "latencyEwmaMs":   round(self._ewma_ms, 1) if self._ewma_ms is not None else None,
+                "pressure":        round(self._pressure, 3) if self._pressure is not None else None,
+                "profiles":        profiles,
+                "intraOpThreads":  torch.get_num_threads(),
+                "interOpThreads":  torch.get_num_interop_threads(),
+            }
+
+
+_cores          = _available_cores()
+_max_concurrent = _env_int("INFERENCE_MAX_CONCURRENCY", max(1, _cores // 4))
+_intra_threads  = _env_int("INFERENCE_INTRA_OP_THREADS", max(1, _cores // _max_concurrent))
+_inter_threads  = _env_int("INFERENCE_INTER_OP_THREADS", 1)
+
+torch.set_num_threads(_intra_threads)
+try:
+    torch.set_num_interop_threads(_inter_threads)
+except RuntimeError:
+    # Inter-op pool already started (e.g. module re-imported); keep it.
+    pass
+
+governor = InferenceGovernor(
+    max_limit=_max_concurrent,
+    target_latency_ms=_env_int("INFERENCE_TARGET_LATENCY_MS", 0) or None,
+)
+print(f"  Cores  : {_cores}  ({_max_concurrent} concurrent passes x "
+      f"{_intra_threads} intra-op threads, {_inter_threads} inter-op)")
+
 # ─── COCO LABELS ────────────────────────────────────────────────────────────────
 # torchvision Faster RCNN uses 91-slot COCO label list (some are N/A)
 COCO_LABELS = [
@@ -87,18 +269,37 @@ COCO_LABELS = [
 
 # ─── MODEL LOADING ──────────────────────────────────────────────────────────────
 
-CUSTOM_CHECKPOINT = os.path.join(os.path.dirname(__file__), "checkpoints", "best_model.pth")
+CUSTOM_CHECKPOINT = os.environ.get(
+    "MODEL_CHECKPOINT",
+    os.path.join(os.path.dirname(__file__), "checkpoints", "best_model.pth"),
+)
 CUSTOM_CSV        = os.path.join(os.path.dirname(__file__), "Dataset", "waste", "meta_df.csv")
+ONNX_MODEL        = os.environ.get(
+    "ONNX_MODEL",
+    os.path.join(os.path.dirname(__file__), "checkpoints", "model.onnx"),
+)
+
+MODEL_SOURCE      = os.environ.get("MODEL_SOURCE", "auto")        # auto | custom | coco
+INFERENCE_BACKEND = os.environ.get("INFERENCE_BACKEND", "torch")  # torch | onnx
 
 model        = None
 label_mapper = None   # function: label_str → waste_category_str
 class_labels = None   # list of label strings indexed by class id
 model_source = None   # "custom" or "coco"
+model_engine = None   # "torch", "torchscript" or "onnx"
+
+# Prepared-model cache (see model_cache.py).  Opt-in because the cached
+# TorchScript graph cannot be reconfigured by the quality ladder.
+MODEL_CACHE          = os.environ.get("MODEL_CACHE", "0") == "1"
+MODEL_CACHE_DIR      = os.environ.get("MODEL_CACHE_DIR", os.path.join(os.path.dirname(__file__), "cache"))
+MODEL_CACHE_QUANTIZE = os.environ.get("MODEL_CACHE_QUANTIZE", "0") == "1" and device.type == "cpu"
+
+cache_status = {"enabled": MODEL_CACHE, "status": "disabled" if not MODEL_CACHE else "pending", "key": None}
 
 
 def load_coco_model():
     """Load COCO-pretrained Faster RCNN ResNet50-FPN."""
-    global model, label_mapper, class_labels, model_source
+    global model, label_mapper, class_labels, model_source, model_engine
 
     print("\n  Loading COCO-pretrained Faster RCNN (ResNet50-FPN)...")
     weights = torchvision.models.detection.FasterRCNN_ResNet50_FPN_Weights.DEFAULT
@@ -109,6 +310,7 @@ def load_coco_model():
     class_labels = COCO_LABELS          # 91 slots
     label_mapper = map_coco_label_to_waste_category
     model_source = "coco"
+    model_engine = "torch"
 
     print("  [OK] COCO model loaded  (80 object classes -> 4 waste categories)")
     print("  [INFO] To use your custom trained model, place best_model.pth in Model/checkpoints/")
@@ -117,49 +319,302 @@ def load_coco_model():
 def load_custom_model():
     """
     Load the custom-trained WALL.E Faster RCNN checkpoint.
-    Requires:  Model/checkpoints/best_model.pth
-               Model/Dataset/waste/meta_df.csv  (for label mapping)
+    Requires:  Model/checkpoints/best_model.pth (or MODEL_CHECKPOINT)
+               Model/Dataset/waste/meta_df.csv  (label mapping, only for
+               checkpoints saved without 'class_names')
     """
-    global model, label_mapper, class_labels, model_source
+    global model, label_mapper, class_labels, model_source, model_engine
 
     print(f"\n  Found custom checkpoint: {CUSTOM_CHECKPOINT}")
     print("  Loading custom Faster RCNN model...")
 
-    # Build category mapping from CSV
-    import pandas as pd
-    df = pd.read_csv(CUSTOM_CSV)
-    categories = sorted(df['cat_name'].unique().tolist())
-    cat_to_idx = {cat: idx + 1 for idx, cat in enumerate(categories)}
-    idx_to_cat = {v: k for k, v in cat_to_idx.items()}
-    num_classes = len(categories) + 1   # +1 for background
+    checkpoint = torch.load(CUSTOM_CHECKPOINT, map_location=device, weights_only=False)
+
+    if "class_names" in checkpoint:
+        # Self-describing checkpoint (train.py / distill.py)
+        labels = list(checkpoint["class_names"])
+    else:
+        # Build category mapping from CSV
+        import pandas as pd
+        df = pd.read_csv(CUSTOM_CSV)
+        categories = sorted(df['cat_name'].unique().tolist())
+        labels = ["__background__"] + categories
+    num_classes = len(labels)   # includes background
 
     # Load model architecture from model.py
-    from model import get_model, load_model as _load_model
-    m = get_model(num_classes=num_classes, pretrained=False)
-    m, _, _ = _load_model(m, None, CUSTOM_CHECKPOINT, device)
+    from model import get_model
+    m = get_model(
+        num_classes=num_classes,
+        pretrained=False,
+        min_size=checkpoint.get("min_size", 512),
+        max_size=checkpoint.get("max_size", 768),
+    )
+    m.load_state_dict(checkpoint["model_state_dict"])
+    m.to(device)
     m.eval()
 
     model        = m
-    class_labels = [idx_to_cat.get(i, "__background__") for i in range(num_classes)]
+    class_labels = labels
     label_mapper = map_custom_label_to_waste_category
     model_source = "custom"
+    model_engine = "torch"
+
+    print(f"  [OK] Custom model loaded  ({num_classes - 1} waste classes -> 4 categories, "
+          f"epoch {checkpoint.get('epoch', 0)})")
+    return True
+
+
+def load_onnx_model():
+    """
+    Serve an exported detector (see export_onnx.py) through ONNX Runtime.
+    Requires:  ONNX_MODEL (default Model/checkpoints/model.onnx)
+               <ONNX_MODEL>.json  (label table written by the exporter)
+    """
+    global model, label_mapper, class_labels, model_source, model_engine
+
+    print(f"\n  Loading ONNX Runtime detector: {ONNX_MODEL}")
+    from onnx_backend import OnnxDetector
+    detector = OnnxDetector(ONNX_MODEL, intra_op_threads=torch.get_num_threads())
+
+    model        = detector
+    class_labels = detector.class_labels
+    model_source = detector.model_source
+    label_mapper = _label_mapper_for(model_source)
+    model_engine = "onnx"
+
+    print(f"  [OK] ONNX model loaded  ({model_source} labels, CPU execution provider)")
+    return True
+
+
+def _label_mapper_for(source):
+    if source == "coco":
+        return map_coco_label_to_waste_category
+    return map_custom_label_to_waste_category
+
+
+def _source_digest(source):
+    """Identity of the weights a model is built from, for the cache key."""
+    from model_cache import file_sha256
+    if source == "custom":
+        csv_digest = file_sha256(CUSTOM_CSV) if os.path.exists(CUSTOM_CSV) else "-"
+        return f"custom:{file_sha256(CUSTOM_CHECKPOINT)}:{csv_digest}"
+    return f"coco:{torchvision.models.detection.FasterRCNN_ResNet50_FPN_Weights.DEFAULT.url}"
 
-    print(f"  [OK] Custom model loaded  ({num_classes - 1} waste classes -> 4 categories)")
+
+def load_cached_model(source):
+    """Load the prepared artifact for `source` if the cache holds a matching key."""
+    global model, label_mapper, class_labels, model_source, model_engine
+    from model_cache import cache_key, load_artifact
+
+    try:
+        key = cache_key(_source_digest(source), device, MODEL_CACHE_QUANTIZE)
+        cache_status["key"] = key
+        hit = load_artifact(MODEL_CACHE_DIR, key, device)
+    except Exception as e:
+        print(f"\n  [WARNING] Could not read model cache ({e}). Building from scratch.")
+        return False
+    if hit is None:
+        return False
+
+    detector, meta = hit
+    model        = detector
+    class_labels = meta["classLabels"]
+    model_source = meta["modelSource"]
+    label_mapper = _label_mapper_for(model_source)
+    model_engine = "torchscript"
+    cache_status["status"] = "hit"
+
+    print(f"\n  [OK] Loaded prepared {model_source} model from cache ({key})")
     return True
 
 
-# Try custom first, fall back to COCO
+def build_model_cache_in_background():
+    """Script the current eager model, persist it, then swap it in."""
+    eager, source, labels = model, model_source, list(class_labels)
+    cache_status["status"] = "building"
+
+    def worker():
+        global model, model_engine, quality_models
+        from model_cache import cache_key, build_artifact
+        try:
+            key = cache_key(_source_digest(source), device, MODEL_CACHE_QUANTIZE)
+            detector = build_artifact(
+                eager, MODEL_CACHE_DIR, key,
+                {"modelSource": source, "classLabels": labels},
+                quantize=MODEL_CACHE_QUANTIZE,
+            )
+        except Exception as e:
+            cache_status.update(status="failed", error=str(e))
+            print(f"  [WARNING] Model cache build failed ({e}). Continuing with eager model.")
+            return
+
+        model          = detector
+        model_engine   = "torchscript"
+        quality_models = build_quality_variants(detector)
+        cache_status.update(status="ready", key=key)
+        print(f"  [OK] Prepared model cached ({key}) and now serving")
+
+    threading.Thread(target=worker, name="model-cache-build", daemon=True).start()
+
+
+# ONNX if requested, else custom when available, falling back to COCO
 try:
-    if os.path.exists(CUSTOM_CHECKPOINT) and os.path.exists(CUSTOM_CSV):
-        load_custom_model()
+    if INFERENCE_BACKEND == "onnx":
+        load_onnx_model()
     else:
-        load_coco_model()
+        _source = "custom" if MODEL_SOURCE == "custom" or (
+            MODEL_SOURCE == "auto" and os.path.exists(CUSTOM_CHECKPOINT)
+        ) else "coco"
+        if not (MODEL_CACHE and load_cached_model(_source)):
+            load_custom_model() if _source == "custom" else load_coco_model()
 except Exception as e:
-    print(f"\n  [WARNING] Could not load custom model ({e}). Falling back to COCO model.")
+    print(f"\n  [WARNING] Could not load {INFERENCE_BACKEND}/{MODEL_SOURCE} model ({e}). "
+          "Falling back to COCO model.")
     load_coco_model()
 
 print("=" * 65)
 
+# ─── QUALITY LADDER ─────────────────────────────────────────────────────────────
+# Named speed/quality profiles for the detector.  Each profile is a shallow
+# copy of the loaded model that shares its weights but has its own resize
+# limits (scaled from the model's native min_size/max_size), RPN proposal
+# counts and detections-per-image cap, so requests on different profiles can
+# run concurrently without touching shared state.
+#
+# Requests pick a profile with ?quality=full|balanced|fast (or "quality" in the
+# JSON body).  Otherwise, with QUALITY_MODE=auto (the default), the service
+# steps one level down while QUALITY_STEP_DOWN_QUEUE or more requests are
+# waiting on the inference governor and steps back up after
+# QUALITY_COOLDOWN_S seconds with an empty queue.  QUALITY_MODE=full pins the
+# default to full quality.
+
+QUALITY_PROFILES = {
+    "full":     {"scale": 1.0,  "rpn_pre_nms_top_n": None, "rpn_post_nms_top_n": None, "detections_per_img": None},
+    "balanced": {"scale": 0.75, "rpn_pre_nms_top_n": 500,  "rpn_post_nms_top_n": 300,  "detections_per_img": 50},
+    "fast":     {"scale": 0.5,  "rpn_pre_nms_top_n": 250,  "rpn_post_nms_top_n": 100,  "detections_per_img": 25},
+}
+QUALITY_LADDER = ["full", "balanced", "fast"]   # best → fastest
+
+
+def _shallow_module_copy(module):
+    """Copy a module without copying its parameters or sharing its child table."""
+    clone = copy.copy(module)
+    clone._modules = module._modules.copy()
+    return clone
+
+
+def build_quality_variants(base):
+    """
+    Build one detector per quality profile from an eager Faster RCNN model.
+
+    Models that cannot be reconfigured (e.g. traced or exported engines) only
+    get the "full" profile.
+    """
+    from torchvision.models.detection.generalized_rcnn import GeneralizedRCNN
+
+    if not isinstance(base, GeneralizedRCNN):
+        return {"full": base}
+
+    variants = {}
+    for name, cfg in QUALITY_PROFILES.items():
+        if name == "full":
+            variants[name] = base
+            continue
+
+        variant = _shallow_module_copy(base)
+
+        transform = _shallow_module_copy(base.transform)
+        transform.min_size = tuple(max(32, int(s * cfg["scale"])) for s in base.transform.min_size)
+        transform.max_size = max(32, int(base.transform.max_size * cfg["scale"]))
+        variant.transform = transform
+
+        rpn = _shallow_module_copy(base.rpn)
+        rpn._pre_nms_top_n  = dict(base.rpn._pre_nms_top_n)
+        rpn._post_nms_top_n = dict(base.rpn._post_nms_top_n)
+        rpn._pre_nms_top_n["testing"]  = min(rpn._pre_nms_top_n["testing"],  cfg["rpn_pre_nms_top_n"])
+        rpn._post_nms_top_n["testing"] = min(rpn._post_nms_top_n["testing"], cfg["rpn_post_nms_top_n"])
+        variant.rpn = rpn
+
+        roi_heads = _shallow_module_copy(base.roi_heads)
+        roi_heads.detections_per_img = min(base.roi_heads.detections_per_img, cfg["detections_per_img"])
+        variant.roi_heads = roi_heads
+
+        variants[name] = variant
+    return variants
+
+
+class QualityLadder:
+    """Chooses the default quality profile from the governor's queue depth."""
+
+    def __init__(self, auto, step_down_queue, cooldown_s):
+        self.auto            = auto
+        self.step_down_queue = max(1, step_down_queue)
+        self.cooldown_s      = cooldown_s
+        self.level           = 0
+        self._lock           = threading.Lock()
+        self._changed_at     = time.monotonic()
+        self._calm_since     = None
+
+    def current(self):
+        if not self.auto:
+            return QUALITY_LADDER[0]
+
+        queued = governor.waiting
+        now    = time.monotonic()
+        with self._lock:
+            if queued >= self.step_down_queue:
+                self._calm_since = None
+                # Step down at most once a second so one burst does not jump
+                # straight to the bottom of the ladder.
+                if self.level < len(QUALITY_LADDER) - 1 and now - self._changed_at >= 1.0:
+                    self.level += 1
+                    self._changed_at = now
+            elif queued == 0:
+                if self._calm_since is None:
+                    self._calm_since = now
+                elif (self.level > 0 and now - self._calm_since >= self.cooldown_s
+                      and now - self._changed_at >= self.cooldown_s):
+                    self.level -= 1
+                    self._changed_at = now
+                    self._calm_since = now
+            else:
+                self._calm_since = None
+            return QUALITY_LADDER[self.level]
+
+    def resolve(self, requested=None):
+        """Validate an explicit profile name, or pick one when none is given."""
+        if requested in (None, "", "auto"):
+            name = self.current()
+        elif isinstance(requested, str) and requested in QUALITY_PROFILES:
+            name = requested
+        else:
+            raise ValueError(
+                f"Unknown quality profile '{requested}'. "
+                f"Choose one of: {', '.join(QUALITY_LADDER)} or auto."
+            )
+        # Engines without reconfigurable variants always run at full quality.
+        return name if name in quality_models else "full"
+
+    def state(self):
+        return {
+            "mode":          "auto" if self.auto else "full",
+            "current":       QUALITY_LADDER[self.level] if self.auto else "full",
+            "available":     [n for n in QUALITY_LADDER if n in quality_models],
+            "stepDownQueue": self.step_down_queue,
+            "cooldownS":     self.cooldown_s,
+        }
+
+
+quality_models = build_quality_variants(model)
+ladder = QualityLadder(
+    auto=os.environ.get("QUALITY_MODE", "auto") == "auto",
+    step_down_queue=_env_int("QUALITY_STEP_DOWN_QUEUE", 2 * governor.max_limit),
+    cooldown_s=float(os.environ.get("QUALITY_COOLDOWN_S", 5)),
+)
+
+if MODEL_CACHE and model_engine == "torch":
+    build_model_cache_in_background()
+
 # ─── IMAGE TRANSFORM ────────────────────────────────────────────────────────────
 
 _transform = T.Compose([T.ToTensor()])
@@ -174,20 +629,20 @@ def preprocess_image(img: Image.Image):
 
 # ─── DETECTION + MAPPING ────────────────────────────────────────────────────────
 
-def run_faster_rcnn(img: Image.Image, conf_threshold: float = 0.4):
+def postprocess_detections(outputs: dict, conf_threshold: float = 0.4, scale=None):
     """
-    Run Faster RCNN on a PIL image.
+    Turn one raw Faster RCNN output dict into the detection list.
+
+    `scale` is the (x, y) factor from a reduced-resolution decode; boxes are
+    mapped back to original image coordinates with it.
 
     Returns:
         detections: list of dicts containing
             { label, label_idx, score, box, waste_category }
     """
-    tensor = preprocess_image(img)
-
-    with torch.no_grad():
-        outputs = model([tensor])[0]   # single image → single output dict
-
     boxes  = outputs["boxes"].cpu().numpy()     # [N, 4]  xyxy
+    if scale is not None:
+        boxes = boxes * np.array([scale[0], scale[1], scale[0], scale[1]], dtype=boxes.dtype)
     labels = outputs["labels"].cpu().numpy()    # [N]
     scores = outputs["scores"].cpu().numpy()    # [N]
 
@@ -218,6 +673,36 @@ def run_faster_rcnn(img: Image.Image, conf_threshold: float = 0.4):
     return detections
 
 
+def run_faster_rcnn_batch(imgs: list, conf_threshold: float = 0.4, quality: str = "full"):
+    """
+    Run Faster RCNN on several PIL images in a single forward pass.
+
+    Returns:
+        one detection list per input image (see postprocess_detections)
+    """
+    tensors  = [preprocess_image(img) for img in imgs]
+    detector = quality_models.get(quality, model)
+
+    with governor.slot(quality), torch.no_grad():
+        outputs = detector(tensors)
+
+    return [
+        postprocess_detections(out, conf_threshold, scale=img.info.get("decode_scale"))
+        for img, out in zip(imgs, outputs)
+    ]
+
+
+def run_faster_rcnn(img: Image.Image, conf_threshold: float = 0.4, quality: str = "full"):
+    """
+    Run Faster RCNN on a PIL image.
+
+    Returns:
+        detections: list of dicts containing
+            { label, label_idx, score, box, waste_category }
+    """
+    return run_faster_rcnn_batch([img], conf_threshold=conf_threshold, quality=quality)[0]
+
+
 def aggregate_waste_category(detections: list) -> dict:
     """
     Aggregate per-detection waste categories into a single verdict.
@@ -259,14 +744,19 @@ def aggregate_waste_category(detections: list) -> dict:
     }
 
 
-def classify_image(img: Image.Image, conf_threshold: float = 0.4) -> dict:
+def classify_image(img: Image.Image, conf_threshold: float = 0.4, quality: str = "full") -> dict:
     """
     Full pipeline: PIL Image → waste classification result.
 
     Returns a dict ready to be JSON-serialised.
     """
-    detections = run_faster_rcnn(img, conf_threshold=conf_threshold)
-    agg        = aggregate_waste_category(detections)
+    detections = run_faster_rcnn(img, conf_threshold=conf_threshold, quality=quality)
+    return {**summarize_detections(detections, conf_threshold), "qualityProfile": quality}
+
+
+def summarize_detections(detections: list, conf_threshold: float = 0.4) -> dict:
+    """Build the classification payload from an image's detection list."""
+    agg = aggregate_waste_category(detections)
 
     # Best individual detection (highest score)
     best_det = max(detections, key=lambda d: d["score"]) if detections else None
@@ -290,13 +780,113 @@ def classify_image(img: Image.Image, conf_threshold: float = 0.4) -> dict:
     }
 
 
-# ─── HELPERS ────────────────────────────────────────────────────────────────────
+# ─── IMAGE INTAKE ───────────────────────────────────────────────────────────────
+# Every image is probed from its header before any pixel data is decoded:
+#   • images over MAX_IMAGE_PIXELS are rejected with 413 (Pillow's own bomb
+#     guard is aligned to the same limit)
+#   • JPEGs much larger than the detector input are decoded at 1/2, 1/4 or 1/8
+#     scale via Image.draft() (image_io.py, shared with the offline tools);
+#     boxes are mapped back to original coordinates
+#   • decoded pixels are reserved against DECODE_PIXEL_BUDGET, shared by all
+#     in-flight requests, so worker memory stays bounded under any input mix
+# Upload bodies themselves are capped by MAX_UPLOAD_MB.
+
+MAX_IMAGE_PIXELS    = _env_int("MAX_IMAGE_PIXELS", 40_000_000)
+DECODE_PIXEL_BUDGET = _env_int("DECODE_PIXEL_BUDGET", max(MAX_IMAGE_PIXELS, 4 * 12_000_000))
+DECODE_WAIT_S       = float(os.environ.get("DECODE_WAIT_S", 10))
+
+Image.MAX_IMAGE_PIXELS = MAX_IMAGE_PIXELS
+app.config["MAX_CONTENT_LENGTH"] = _env_int("MAX_UPLOAD_MB", 25) * 1024 * 1024
+
+
+class ServiceBusyError(Exception):
+    """Decode budget stayed exhausted for DECODE_WAIT_S seconds (HTTP 503)."""
+
+
+class PixelBudget:
+    """Counting limit on decoded pixels held by in-flight requests."""
+
+    def __init__(self, capacity, timeout_s):
+        self.capacity  = capacity
+        self.timeout_s = timeout_s
+        self.in_use    = 0
+        self._cond     = threading.Condition()
+
+    def acquire(self, pixels):
+        if pixels > self.capacity:
+            raise ImageTooLargeError(
+                f"Image needs {pixels} decoded pixels, above the {self.capacity} pixel budget"
+            )
+        with self._cond:
+            ok = self._cond.wait_for(lambda: self.in_use + pixels <= self.capacity, self.timeout_s)
+            if not ok:
+                raise ServiceBusyError("Too many large images in flight, retry shortly")
+            self.in_use += pixels
+
+    def release(self, pixels):
+        with self._cond:
+            self.in_use -= pixels
+            self._cond.notify_all()
+
+    def state(self):
+        return {"inUsePixels": self.in_use, "capacityPixels": self.capacity}
+
+
+decode_budget = PixelBudget(DECODE_PIXEL_BUDGET, DECODE_WAIT_S)
+
+
+def _model_input_limits():
+    """(min_size, max_size) the detector resizes to; conservative default if unknown."""
+    transform = getattr(model, "transform", None) or getattr(getattr(model, "module", None), "transform", None)
+    # OnnxDetector has no transform; it carries the exported limits itself
+    transform = transform or (model if getattr(model, "max_size", None) else None)
+    try:
+        return int(transform.min_size[-1]), int(transform.max_size)
+    except (AttributeError, TypeError, IndexError):
+        return DEFAULT_MIN_SIZE, DEFAULT_MAX_SIZE
+
+
+def open_image(fp) -> Image.Image:
+    """
+    Probe, optionally draft-decode, and decode an image within the pixel budget.
+
+    `fp` is a path or a binary file object.  The returned RGB image holds a
+    budget reservation that must be returned with release_image().
+    """
+    img, size = open_drafted(fp, *_model_input_limits(), max_pixels=MAX_IMAGE_PIXELS)
+    pixels = img.size[0] * img.size[1]
+    try:
+        decode_budget.acquire(pixels)
+    except Exception:
+        img.close()
+        raise
+    try:
+        rgb = finish_decode(img, size)
+    except Exception:
+        decode_budget.release(pixels)
+        raise
+
+    rgb.info["decode_pixels"] = pixels
+    return rgb
+
+
+def decode_image(fp) -> Image.Image:
+    """Same probe and draft decode as open_image, without a budget reservation (offline tools)."""
+    return finish_decode(*open_drafted(fp, *_model_input_limits(), max_pixels=MAX_IMAGE_PIXELS))
+
+
+def release_image(img: Image.Image):
+    """Return an image's decode-budget reservation (safe to call twice)."""
+    pixels = img.info.pop("decode_pixels", 0)
+    if pixels:
+        decode_budget.release(pixels)
+
 
 def load_image_from_request(req):
     """Load PIL Image from Flask request (file / JSON path / base64)."""
     if "image" in req.files:
         f     = req.files["image"]
-        img   = Image.open(io.BytesIO(f.read())).convert("RGB")
+        img   = open_image(f.stream)
         return img, f.filename or "upload"
 
     if req.is_json:
@@ -306,14 +896,14 @@ def load_image_from_request(req):
             path = data["image_path"]
             if not os.path.exists(path):
                 raise FileNotFoundError(f"Image not found: {path}")
-            return Image.open(path).convert("RGB"), path
+            return open_image(path), path
 
         if "image_base64" in data:
             b64 = data["image_base64"]
             if "," in b64:
                 b64 = b64.split(",", 1)[1]
             raw = base64.b64decode(b64)
-            return Image.open(io.BytesIO(raw)).convert("RGB"), "base64_image"
+            return open_image(io.BytesIO(raw)), "base64_image"
 
     raise ValueError(
         "No image provided. Send 'image' as file, "
@@ -321,6 +911,124 @@ def load_image_from_request(req):
     )
 
 
+# ─── REQUEST PROFILING ──────────────────────────────────────────────────────────
+# Opt-in per request: send "X-Profile: 1", or arm the next N requests with
+# POST /admin/profile {"requests": N}.  Profiled requests run the pipeline
+# stage by stage under torch.profiler and write to PROFILE_DIR:
+#   <id>.trace.json   Chrome trace (open in chrome://tracing or Perfetto)
+#   <id>.ops.txt      operator-level summary table
+#   <id>.stages.json  Python-level wall time per pipeline stage
+# Unprofiled requests take the normal path; the only cost is the check in
+# RequestProfiler.wants().  Profiling is disabled unless ADMIN_TOKEN is set;
+# both triggers then require a matching X-Admin-Token header, and at most
+# PROFILE_MAX_REQUESTS requests can be armed at once.
+
+PROFILE_DIR          = os.environ.get("PROFILE_DIR", os.path.join(os.path.dirname(__file__), "profiles"))
+ADMIN_TOKEN          = os.environ.get("ADMIN_TOKEN")
+PROFILE_MAX_REQUESTS = _env_int("PROFILE_MAX_REQUESTS", 20)
+
+
+def _admin_authorized(req):
+    token = req.headers.get("X-Admin-Token")
+    return bool(ADMIN_TOKEN) and token is not None and hmac.compare_digest(token.encode("utf-8"), ADMIN_TOKEN.encode("utf-8"))
+
+
+class RequestProfiler:
+    """Captures torch.profiler traces for selected classification requests."""
+
+    def __init__(self, out_dir):
+        self.out_dir    = out_dir
+        self._lock      = threading.Lock()
+        self._remaining = 0
+        self._seq       = 0
+        self.recent     = deque(maxlen=20)
+
+    def arm(self, n):
+        """Profile the next `n` classification requests (capped)."""
+        with self._lock:
+            self._remaining = min(max(0, int(n)), PROFILE_MAX_REQUESTS)
+
+    def wants(self, req):
+        if self._remaining:
+            with self._lock:
+                if self._remaining > 0:
+                    self._remaining -= 1
+                    return True
+        return req.headers.get("X-Profile") == "1" and _admin_authorized(req)
+
+    def state(self):
+        with self._lock:
+            return {"remaining": self._remaining, "dir": self.out_dir, "recent": list(self.recent)}
+
+    def run(self, load, conf_threshold, quality="full"):
+        """
+        Run load → preprocess → forward → postprocess under the profiler.
+
+        `load` is a zero-argument callable returning (PIL image, source).
+        Returns (source, result, profile_info).
+        """
+        from torch.profiler import profile, record_function, ProfilerActivity
+
+        stages = {}
+
+        @contextmanager
+        def stage(name):
+            start = time.perf_counter()
+            with record_function(name):
+                yield
+            stages[name] = round((time.perf_counter() - start) * 1000.0, 3)
+
+        activities = [ProfilerActivity.CPU]
+        if device.type == "cuda":
+            activities.append(ProfilerActivity.CUDA)
+
+        total_start = time.perf_counter()
+        with profile(activities=activities, record_shapes=True) as prof:
+            with stage("load_image_from_request"):
+                img, source = load()
+            try:
+                with stage("preprocess_image"):
+                    tensor = preprocess_image(img)
+                with stage("forward"):
+                    # Own governor profile: profiler overhead must not set the baseline
+                    with governor.slot(f"{quality}/profiled"), torch.no_grad():
+                        outputs = quality_models.get(quality, model)([tensor])[0]
+                with stage("postprocess"):
+                    detections = postprocess_detections(outputs, conf_threshold, scale=img.info.get("decode_scale"))
+                    result     = summarize_detections(detections, conf_threshold)
+                    result["qualityProfile"] = quality
+            finally:
+                release_image(img)
+        stages["total"] = round((time.perf_counter() - total_start) * 1000.0, 3)
+
+        with self._lock:
+            self._seq += 1
+            profile_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{self._seq:04d}"
+
+        os.makedirs(self.out_dir, exist_ok=True)
+        base = os.path.join(self.out_dir, profile_id)
+        prof.export_chrome_trace(base + ".trace.json")
+        sort_key = "self_cuda_time_total" if device.type == "cuda" else "self_cpu_time_total"
+        with open(base + ".ops.txt", "w", encoding="utf-8") as f:
+            f.write(prof.key_averages(group_by_input_shape=True).table(sort_by=sort_key, row_limit=40))
+        info = {
+            "id":        profile_id,
+            "source":    source,
+            "imageSize": list(img.size),
+            "stagesMs":  stages,
+            "traceFile": base + ".trace.json",
+        }
+        with open(base + ".stages.json", "w", encoding="utf-8") as f:
+            json.dump(info, f, indent=2)
+
+        with self._lock:
+            self.recent.append(info)
+        return source, result, info
+
+
+profiler = RequestProfiler(PROFILE_DIR)
+
+
 # ─── ROUTES ─────────────────────────────────────────────────────────────────────
 
 @app.route("/health", methods=["GET"])
@@ -331,8 +1039,13 @@ def health():
         "model":      "Faster RCNN ResNet50-FPN",
         "backbone":   "ResNet-50 + FPN",
         "modelSource": model_source,
+        "engine":     model_engine,
         "device":     str(device),
         "categories": list(CATEGORY_INFO.keys()),
+        "inference":  governor.state(),
+        "quality":    ladder.state(),
+        "modelCache": cache_status,
+        "decode":     decode_budget.state(),
     })
 
 
@@ -351,8 +1064,9 @@ def classify():
       • application/json     → 'image_path'   (absolute path)
       • application/json     → 'image_base64' (data URI or raw base64)
 
-    Optional query param:
+    Optional query params:
       • threshold=0.4  (default 0.4, detection confidence cutoff)
+      • quality=full|balanced|fast  (default: chosen from current load)
 
     Returns:
       {
@@ -367,15 +1081,32 @@ def classify():
         ],
         "totalDetections" : 1,
         "modelSource"     : "coco",
+        "qualityProfile"  : "full",
         "categoryInfo"    : { ... }
       }
     """
     threshold = float(request.args.get("threshold", 0.4))
     try:
+        requested = request.args.get("quality")
+        if requested is None and request.is_json:
+            requested = (request.get_json(silent=True) or {}).get("quality")
+        quality = ladder.resolve(requested)
+
+        if profiler.wants(request):
+            source, result, info = profiler.run(lambda: load_image_from_request(request), threshold, quality)
+            return jsonify({"success": True, "source": source, **result, "profile": info})
+
         img, source = load_image_from_request(request)
-        result      = classify_image(img, conf_threshold=threshold)
+        try:
+            result = classify_image(img, conf_threshold=threshold, quality=quality)
+        finally:
+            release_image(img)
         return jsonify({"success": True, "source": source, **result})
 
+    except (ImageTooLargeError, RequestEntityTooLarge) as e:
+        return jsonify({"success": False, "error": "image_too_large",   "message": str(e)}), 413
+    except ServiceBusyError as e:
+        return jsonify({"success": False, "error": "service_busy",      "message": str(e)}), 503
     except FileNotFoundError as e:
         return jsonify({"success": False, "error": "file_not_found",    "message": str(e)}), 404
     except ValueError as e:
@@ -402,6 +1133,11 @@ def classify_by_path():
     threshold = float(data.get("threshold", 0.4))
     img_path  = data["image_path"]
 
+    try:
+        quality = ladder.resolve(data.get("quality"))
+    except ValueError as e:
+        return jsonify({"success": False, "error": "invalid_request", "message": str(e)}), 400
+
     try:
         if not os.path.exists(img_path):
             return jsonify({
@@ -410,10 +1146,23 @@ def classify_by_path():
                 "message": f"Image not found at: {img_path}",
             }), 404
 
-        img    = Image.open(img_path).convert("RGB")
-        result = classify_image(img, conf_threshold=threshold)
+        if profiler.wants(request):
+            _, result, info = profiler.run(lambda: (open_image(img_path), img_path), threshold, quality)
+            return jsonify({"success": True, "source": img_path, **result, "profile": info})
+
+        img = open_image(img_path)
+        try:
+            result = classify_image(img, conf_threshold=threshold, quality=quality)
+        finally:
+            release_image(img)
         return jsonify({"success": True, "source": img_path, **result})
 
+    except ImageTooLargeError as e:
+        return jsonify({"success": False, "error": "image_too_large", "message": str(e)}), 413
+    except ServiceBusyError as e:
+        return jsonify({"success": False, "error": "service_busy", "message": str(e)}), 503
+    except ValueError as e:
+        return jsonify({"success": False, "error": "invalid_request", "message": str(e)}), 400
     except Exception as e:
         traceback.print_exc()
         return jsonify({"success": False, "error": "detection_failed", "message": str(e)}), 500
@@ -426,6 +1175,7 @@ def model_info():
     num_params    = sum(p.numel() for p in model.parameters()) if model else 0
     return jsonify({
         "modelSource":    model_source,
+        "engine":         model_engine,
         "backbone":       "ResNet-50 + FPN",
         "detector":       "Faster RCNN",
         "device":         str(device),
@@ -436,6 +1186,83 @@ def model_info():
     })
 
 
+@app.route("/admin/profile", methods=["GET", "POST"])
+def admin_profile():
+    """
+    Arm request profiling.
+    Body: { "requests": 5 }   → profile the next 5 classification requests
+                                 (at most PROFILE_MAX_REQUESTS)
+    GET returns the pending count and the most recent profiles.
+    """
+    if not ADMIN_TOKEN:
+        return jsonify({
+            "success": False,
+            "error":   "profiling_disabled",
+            "message": "Set ADMIN_TOKEN to enable request profiling",
+        }), 403
+    if not _admin_authorized(request):
+        return jsonify({"success": False, "error": "unauthorized", "message": "Invalid admin token"}), 401
+
+    if request.method == "POST":
+        data = request.get_json(silent=True) or {}
+        try:
+            profiler.arm(data.get("requests", 1))
+        except (TypeError, ValueError):
+            return jsonify({
+                "success": False,
+                "error":   "invalid_request",
+                "message": "'requests' must be an integer",
+            }), 400
+
+    return jsonify({"success": True, **profiler.state()})
+
+
+# ─── LOCAL SOCKET TRANSPORT ─────────────────────────────────────────────────────
+# Optional Unix domain socket listener for a co-located backend: image bytes
+# in, compact JSON out, without HTTP or multipart parsing.
+
+UDS_PATH = os.environ.get("UDS_PATH")
+
+# categoryInfo is static per category (GET /categories) and detections are
+# opt-in, so the compact result leaves both out.
+COMPACT_FIELDS = (
+    "wasteType", "confidence", "confidencePercent", "categoryVotes",
+    "categoryDetail", "totalDetections", "modelSource", "qualityProfile",
+)
+
+
+def classify_raw(raw, threshold=0.4, quality=None, include_detections=False):
+    """Encoded image bytes → (status, compact result) for the binary transport."""
+    try:
+        quality = ladder.resolve(quality)
+        img = open_image(io.BytesIO(raw))
+        try:
+            result = classify_image(img, conf_threshold=threshold, quality=quality)
+        finally:
+            release_image(img)
+    except ImageTooLargeError as e:
+        return 413, {"error": "image_too_large",  "message": str(e)}
+    except ServiceBusyError as e:
+        return 503, {"error": "service_busy",     "message": str(e)}
+    except ValueError as e:
+        return 400, {"error": "invalid_request",  "message": str(e)}
+    except Exception as e:
+        traceback.print_exc()
+        return 500, {"error": "detection_failed", "message": str(e)}
+
+    compact = {k: result[k] for k in COMPACT_FIELDS}
+    if include_detections:
+        compact["detections"] = result["detections"]
+    return 200, compact
+
+
+def start_uds_listener(path=None):
+    """Serve classify_raw on a Unix domain socket in a background thread."""
+    import uds_transport
+    path = path or UDS_PATH
+    return uds_transport.serve(path, classify_raw, app.config["MAX_CONTENT_LENGTH"])
+
+
 # ─── MAIN ───────────────────────────────────────────────────────────────────────
 
 if __name__ == "__main__":
@@ -448,6 +1275,7 @@ if __name__ == "__main__":
     print("    GET  /model/info      -> Detailed model info")
     print("    POST /classify        -> Classify image (file/base64/path)")
     print("    POST /classify/path   -> Classify by absolute file path")
+    print("    POST /admin/profile   -> Profile the next N requests")
     print("")
     print("  Quick test:")
     print("    curl http://localhost:5001/health")
@@ -455,6 +1283,10 @@ if __name__ == "__main__":
     print("         -F 'image=@/path/to/waste_image.jpg'")
     print("=" * 65)
 
+    if UDS_PATH:
+        start_uds_listener()
+        print(f"Binary transport on unix:{UDS_PATH}")
+
     port = int(os.environ.get("PORT", 7860))
     print(f"Listening on http://0.0.0.0:{port}")
     app.run(host="0.0.0.0", port=port, debug=False, threaded=True)